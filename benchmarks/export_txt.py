@@ -0,0 +1,41 @@
+"""
+Benchmark for exporting parameters as text files
+
+Times to_txt for a synthetic experiment with imported and calculated
+parameters.
+
+Run: python benchmarks/export_txt.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import visual_phenomics_py as vppy
+
+from synthetic import experiment
+
+
+if __name__ == '__main__':
+
+    with tempfile.TemporaryDirectory() as folder:
+        experiment(os.path.join(folder, 'data'), samples=2000, days=5)
+        df = vppy.dataframe(os.path.join(folder, 'data') + os.sep)
+        vppy.calculate_many(df, ['Fvfm', 'NPQ', 'NPQt', 'Phi2', 'PhiNO', 'PhiNOt', 'PhiNPQ',
+                                 'PhiNPQt', 'qE', 'qEsv', 'qEt', 'qI', 'qIt', 'qL', 'qP'])
+
+        cols = [col for col in df.columns if col not in ['sample', 'name', 'position', 'flat', 'experiment',
+                                                          'camera', 'replicate', 'time', 'light_intensity']]
+
+        start = time.perf_counter()
+        vppy.to_txt(df, os.path.join(folder, 'export'), cols=cols)
+        elapsed = time.perf_counter() - start
+
+        size = sum(os.path.getsize(os.path.join(folder, 'export', f))
+                   for f in os.listdir(os.path.join(folder, 'export'))) / 1024 ** 2
+
+    print('Exported {0} columns for {1} samples ({2} rows) in {3:.2f} s ({4:.1f} MB)'.format(
+        len(cols), df['sample'].nunique(), len(df), elapsed, size))
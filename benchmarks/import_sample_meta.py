@@ -0,0 +1,65 @@
+"""
+Micro-benchmark for parsing the sample annotations during import
+
+Compares parsing the sample header (name[position][flat][experiment][camera][replicate])
+for every sample and timepoint, as the previous importer did, with parsing
+each unique sample once.
+
+Run: python benchmarks/import_sample_meta.py
+"""
+
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import visual_phenomics_py as vppy
+from visual_phenomics_py.dataframe import _sample_meta
+
+from synthetic import experiment
+
+
+def parse(sample):
+    """Parse a sample header without caching (previous importer)"""
+    meta = re.findall(r"\[(.*?)\]", sample)
+    if len(meta) == 4:
+        meta.insert(0, "n/a")
+    if meta[0] == '':
+        meta[0] = "n/a"
+    return (sample.split('[')[0], meta[0], meta[1], meta[2], meta[3], meta[4])
+
+
+if __name__ == '__main__':
+
+    with tempfile.TemporaryDirectory() as folder:
+        experiment(folder, samples=2000, days=5)
+
+        _sample_meta.cache_clear()
+        start = time.perf_counter()
+        df = vppy.dataframe(folder + os.sep)
+        elapsed = time.perf_counter() - start
+
+    # The previous importer parsed the sample for every new sample+time row
+    samples = df['sample'].astype(str).tolist()
+    calls_before = len(samples)
+    calls_after = _sample_meta.cache_info().misses
+
+    start = time.perf_counter()
+    for sample in samples:
+        parse(sample)
+    time_before = time.perf_counter() - start
+
+    _sample_meta.cache_clear()
+    start = time.perf_counter()
+    for sample in df['sample'].cat.categories:
+        _sample_meta(sample)
+    time_after = time.perf_counter() - start
+
+    print('Imported {0} rows ({1} samples) in {2:.2f} s'.format(len(df), df['sample'].nunique(), elapsed))
+    print('Regex calls: {0} per sample and timepoint, {1} per unique sample ({2} removed)'.format(
+        calls_before, calls_after, calls_before - calls_after))
+    print('Parsing time: {0:.3f} s per sample and timepoint, {1:.3f} s per unique sample'.format(
+        time_before, time_after))
@@ -0,0 +1,59 @@
+"""
+Benchmark for the formats to save and load DataFrames
+
+Compares the file size and load times for pickle (zip), Parquet, Feather and
+npy (with and without memory-mapping), loading the full DataFrame and a
+single parameter for one experiment.
+
+Run: python benchmarks/save_load.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import visual_phenomics_py as vppy
+
+from synthetic import experiment
+
+
+def timed(fn, repeat=3):
+    """Best time out of repeated calls"""
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == '__main__':
+
+    with tempfile.TemporaryDirectory() as folder:
+        experiment(os.path.join(folder, 'data'), samples=1000, days=5)
+        df = vppy.dataframe(os.path.join(folder, 'data') + os.sep)
+        vppy.calculate_many(df, ['Fvfm', 'NPQt', 'PhiNO', 'PhiNPQ', 'qL'])
+        experiment_name = df['experiment'].cat.categories[0]
+
+        print('{0:<12}{1:>10}{2:>14}{3:>22}'.format('Format', 'Size (MB)', 'Load all (s)', 'Load phi2, 1 exp (s)'))
+
+        for file_format, mmap in [('pickle', False), ('parquet', False), ('feather', False), ('npy', False), ('npy', True)]:
+            label = file_format + (' (mmap)' if mmap else '')
+            try:
+                filepath = vppy.save(df, os.path.join(folder, 'saved'), format=file_format)
+            except Exception as e:
+                print('{0:<12}{1}'.format(label, e))
+                continue
+
+            if os.path.isdir(filepath):
+                size = sum(os.path.getsize(os.path.join(filepath, f)) for f in os.listdir(filepath)) / 1024 ** 2
+            else:
+                size = os.path.getsize(filepath) / 1024 ** 2
+            full = timed(lambda: vppy.load(filepath, mmap=mmap))
+            subset = timed(lambda: vppy.load(filepath, columns=['phi2'], experiment=experiment_name, mmap=mmap))
+
+            print('{0:<12}{1:>10.1f}{2:>14.3f}{3:>22.3f}'.format(label, size, full, subset))
@@ -0,0 +1,58 @@
+"""
+Create synthetic Visual Phenomics experiments for benchmarks
+"""
+
+import os
+import numpy as np
+
+from visual_phenomics_py.util.timeline import protocol_std_timing
+
+# Typical parameter values (Fm, F0, Fm', ...)
+PARAMETERS = {
+    'fm': 3000, 'f0': 600, 'fmp': 2000, 'fs': 900, 'f0p': 500,
+    'fmpp': 2600, 'f0pp': 550, 'phi2': 0.5, 'npqt': 1.5, 'qlt': 0.6
+}
+
+# Parameters measured once at the beginning of each day
+DARK = ['fm', 'f0']
+
+
+def experiment(folder, samples=500, days=5, protocol='fluctuating', seed=0):
+    """Write a synthetic experiment
+
+    Writes one all<parameter>.txt file per parameter, with one row per sample,
+    one column per timepoint and the light intensities in the last row.
+
+    :param folder: Output folder
+    :param samples: Number of samples (default: 500)
+    :param days: Number of days (default: 5)
+    :param protocol: Protocol for the light measurements (default: fluctuating)
+    :param seed: Random seed (default: 0)
+    :returns: folder
+    """
+
+    rng = np.random.default_rng(seed)
+
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+
+    light_times = np.concatenate([protocol_std_timing(offset=24 * day, protocol=protocol) for day in range(days)])
+    dark_times = np.concatenate([protocol_std_timing(offset=24 * day, protocol='dark') for day in range(days)])
+    light = np.round(100 + 900 * rng.random(len(light_times)), 1)
+
+    names = ['Line-{0}[P{1}][F{2}][EXP1][CAM{3}][{4}]'.format(
+        i % 25, i, i // 50, i % 4, i) for i in range(samples)]
+
+    for param, value in PARAMETERS.items():
+        times = dark_times if param in DARK else light_times
+        intensities = np.zeros(len(times)) if param in DARK else light
+
+        with open(os.path.join(folder, 'all{0}.txt'.format(param)), 'w') as file:
+            file.write('\t'.join(['name[position][flat][experiment][camera][replicate]'] +
+                                 [str(t) for t in times]) + '\n')
+            for name in names:
+                values = value * (1 + 0.1 * rng.standard_normal(len(times)))
+                file.write('\t'.join([name] + [str(v) for v in values]) + '\n')
+            file.write('\t'.join(['*light_intensity'] + [str(v) for v in intensities]) + '\n')
+
+    return folder
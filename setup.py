@@ -9,6 +9,7 @@ setup(
     packages = ['visual_phenomics_py', 'visual_phenomics_py.util'],
     test_suite = 'tests',
     install_requires = ['numpy >= 1.21.5', 'pandas >= 1.3.5', 'matplotlib >= 3.5.1'],
+    extras_require = {'arrow': ['pyarrow']},
     keywords = ['visual-phenomics', 'data-analysis', 'photosynthesis'],
     description='Import and reformat data output files from Visual Phenomics into a DataFrame.',
     long_description=README_MD,
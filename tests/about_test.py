@@ -0,0 +1,47 @@
+"""
+Test file corresponding with visual_phenomics_py.about
+"""
+
+import contextlib
+import io
+import os
+from unittest import TestCase
+
+import visual_phenomics_py as visual_phenomics_py
+
+RESOURCE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources')
+
+
+class AboutTest(TestCase):
+    """
+    Test class corresponding with vppy.summary and vppy.description
+    """
+
+    def setUp(self):
+        """
+        Import the calculation fixture folder.
+        """
+        self.df = visual_phenomics_py.dataframe(os.path.join(RESOURCE_FOLDER, 'calculate'))
+
+    def test_summary(self):
+        """
+        The summary matches the columns of the DataFrame.
+        """
+        summary = visual_phenomics_py.summary(self.df)
+        self.assertEqual(summary['rows'], 24)
+        self.assertListEqual(summary['names'].tolist(), ['Col-0', 'Mut-1'])
+        self.assertListEqual(summary['per_experiment']['samples'].tolist(), [4])
+        self.assertEqual((summary['start'], summary['end'], summary['light_max']), (0.0, 25.0, 500.0))
+
+    def test_changed_in_place(self):
+        """
+        Values changed in place after a summary are described.
+        """
+        self.df.vp.summary()
+        visual_phenomics_py.summary(self.df)
+        self.df.loc[self.df.index, 'time'] = self.df['time'] * 2
+
+        self.assertEqual(visual_phenomics_py.summary(self.df)['end'], 50.0)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            visual_phenomics_py.description(self.df)
+        self.assertIn('50.0 hours', output.getvalue())
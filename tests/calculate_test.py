@@ -0,0 +1,398 @@
+"""
+Test file corresponding with visual_phenomics_py.calculate
+"""
+
+import os
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+import visual_phenomics_py as visual_phenomics_py
+from visual_phenomics_py.calculate import PARAMETERS, ADDITIONAL_PARAMETERS
+from visual_phenomics_py.util import fvfm, npq, npqt, phi2, phino, phinot, phinpq, phinpqt, qe, qesv, qet, qi, qit, ql, qp
+from visual_phenomics_py.util.parameters_additional import lef, vx, sphi2, sphinpq, deltanpq
+
+RESOURCE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources')
+
+# Each parameter calculated for a single row from the fluorescence values
+# with the util functions (r: row, c: constants)
+REFERENCE = {
+    'Fvfm': lambda r, c: fvfm(r.fm, r.f0),
+    'NPQ': lambda r, c: npq(r.fm, r.fmp),
+    'NPQt': lambda r, c: npqt(r.fmp, r.f0p, c['fmf0']),
+    'Phi2': lambda r, c: phi2(r.fmp, r.fs),
+    'PhiNO': lambda r, c: phino(r.fmp, r.fs, r.f0p, r.fm, r.f0),
+    'PhiNOt': lambda r, c: phinot(r.fmp, r.fs, r.f0p, c['fmf0']),
+    'PhiNPQ': lambda r, c: phinpq(r.fmp, r.fs, r.f0p, r.fm, r.f0),
+    'PhiNPQt': lambda r, c: phinpqt(r.fmp, r.fs, r.f0p, c['fmf0']),
+    'qE': lambda r, c: qe(r.fmpp, r.fmp),
+    'qEsv': lambda r, c: qesv(r.fm, r.fmp, r.fmpp),
+    'qEt': lambda r, c: qet(r.fmp, r.f0p, r.fmpp, r.f0pp, c['fmf0']),
+    'qI': lambda r, c: qi(r.fm, r.fmpp),
+    'qIt': lambda r, c: qit(r.fmpp, r.f0pp, c['fmf0']),
+    'qL': lambda r, c: ql(r.fmp, r.fs, r.f0p),
+    'qP': lambda r, c: qp(r.fmp, r.fs, r.f0p),
+    'LEF': lambda r, c: lef(phi2(r.fmp, r.fs), r.light_intensity, c['absorptivity']),
+    'Vx': lambda r, c: vx(phinot(r.fmp, r.fs, r.f0p, c['fmf0']), ql(r.fmp, r.fs, r.f0p),
+                          r.light_intensity, c['absorptivity']),
+    'SPhi2': lambda r, c: sphi2(phi2(r.fmp, r.fs), phinot(r.fmp, r.fs, r.f0p, c['fmf0']),
+                                ql(r.fmp, r.fs, r.f0p), c['phinoopt'], c['fmf0']),
+    'SNPQ': lambda r, c: sphinpq(phi2(r.fmp, r.fs), phinot(r.fmp, r.fs, r.f0p, c['fmf0']),
+                                 ql(r.fmp, r.fs, r.f0p), c['phinoopt'], c['fmf0']),
+    'deltaNPQ': lambda r, c: deltanpq(phinot(r.fmp, r.fs, r.f0p, c['fmf0']), c['phinoopt']),
+}
+
+DEFAULTS = {'fmf0': 4.88, 'phinoopt': 0.2, 'absorptivity': 0.5}
+
+# Sizes of the arrays passed to custom functions
+CALLS = []
+
+
+def scalar_ratio(fm, f0, offset=0.0):
+    """
+    Custom function for single values only
+    """
+    if not fm > 0:
+        return np.nan
+    return (fm - f0) / fm + offset
+
+
+def ratio(fm, f0, offset=0.0):
+    """
+    Custom function for single values and arrays
+    """
+    CALLS.append(np.size(fm))
+    return (fm - f0) / fm + offset
+
+
+def drop_last(fm):
+    """
+    Custom function returning one value less than passed
+    """
+    return fm[:-1]
+
+
+def constant(fm):
+    """
+    Custom function returning a single value
+    """
+    return 1.5
+
+
+def is_high(fs):
+    """
+    Custom function returning booleans
+    """
+    return fs > 900
+
+
+def count_high(fs):
+    """
+    Custom function returning integers
+    """
+    return np.asarray(fs > 900).astype(int) if np.ndim(fs) > 0 else int(fs > 900)
+
+
+class CalculateTest(TestCase):
+    """
+    Test class corresponding with vppy.calculate
+    """
+
+    def setUp(self):
+        """
+        Import the fixture folder, with the rows in random order.
+        """
+        df = visual_phenomics_py.dataframe(os.path.join(RESOURCE_FOLDER, 'calculate'))
+        self.df = df.iloc[np.random.default_rng(0).permutation(len(df))]
+
+    def reference(self, param, **constants):
+        """
+        Calculate a parameter row by row, with fm and f0 forward filled after
+        sorting by sample and time.
+        """
+        constants = dict(DEFAULTS, **constants)
+        df = self.df.sort_values(['sample', 'time'], kind='stable')
+        df[['fm', 'f0']] = df[['fm', 'f0']].ffill()
+        values = [REFERENCE[param](row, constants) for row in df.itertuples()]
+        return pd.Series(values, index=df.index, dtype=float).reindex(self.df.index)
+
+    def assert_values_equal(self, values, expected, msg):
+        """
+        Assert that calculated values match, missing values included
+        """
+        np.testing.assert_allclose(np.asarray(values, dtype=float), np.asarray(expected, dtype=float),
+                                   rtol=1e-12, atol=0, equal_nan=True, err_msg=msg)
+
+    def test_reference_complete(self):
+        """
+        Every parameter has a reference calculation.
+        """
+        self.assertCountEqual(REFERENCE, list(PARAMETERS) + list(ADDITIONAL_PARAMETERS))
+
+    def test_parameters(self):
+        """
+        Every parameter matches the row by row calculation.
+        """
+        for param in PARAMETERS:
+            for fmf0 in [4.88, 4.0]:
+                df = self.df.copy()
+                visual_phenomics_py.calculate(df, param, fmf0=fmf0)
+                self.assert_values_equal(df[param], self.reference(param, fmf0=fmf0),
+                                         "calculate() result \"{0}\" does not match the util functions".format(param))
+
+    def test_additional_parameters(self):
+        """
+        Every additional parameter matches the row by row calculation.
+        """
+        for param in ADDITIONAL_PARAMETERS:
+            df = self.df.copy()
+            visual_phenomics_py.calculate_additional(df, param, phinoopt=0.15, absorptivity=0.45, fmf0=4.0)
+            self.assert_values_equal(df[param], self.reference(param, phinoopt=0.15, absorptivity=0.45, fmf0=4.0),
+                                     "calculate_additional() result \"{0}\" does not match the util functions".format(param))
+
+    def test_calculate_many(self):
+        """
+        Calculating all parameters at once, in chunks or with workers, gives
+        the same values as calculating each parameter on its own.
+        """
+        params = list(PARAMETERS)
+        expected = self.df.copy()
+        for param in params:
+            visual_phenomics_py.calculate(expected, param)
+
+        for kwargs in [{}, {'chunk_samples': 1}, {'workers': 2}]:
+            df = self.df.copy()
+            visual_phenomics_py.calculate_many(df, params, **kwargs)
+            pd.testing.assert_frame_equal(df[params], expected[params], check_exact=True, obj=str(kwargs))
+
+    def test_sweep(self):
+        """
+        Every column of a sweep matches calculating the parameter with the
+        same constants.
+        """
+        params = list(PARAMETERS) + list(ADDITIONAL_PARAMETERS)
+        result = visual_phenomics_py.sweep(self.df, params, fmf0=[4.0, 4.88], phinoopt=[0.15, 0.2],
+                                           absorptivity=[0.45, 0.5])
+
+        self.assertEqual(list(result.columns.names), ['param', 'fmf0', 'phinoopt', 'absorptivity'])
+        self.assertTrue(result.index.equals(self.df.index))
+
+        for label in result.columns:
+            constants = {name: value for name, value in zip(result.columns.names[1:], label[1:]) if not np.isnan(value)}
+            df = self.df.copy()
+            if label[0] in PARAMETERS:
+                visual_phenomics_py.calculate(df, label[0], **constants)
+            else:
+                visual_phenomics_py.calculate_additional(df, label[0], **constants)
+            pd.testing.assert_series_equal(result[label], df[label[0]], check_exact=True, check_names=False,
+                                           obj=str(label))
+
+    def test_reuse_valid_columns(self):
+        """
+        Parameters calculated with the same constants are read from their
+        columns instead of being calculated again.
+        """
+        df = self.df.copy()
+        visual_phenomics_py.calculate_many(df, ['Phi2', 'qL', 'PhiNOt'])
+
+        # Changed columns, but still recorded as calculated with fmf0=4.88
+        df['Phi2'] = df['Phi2'] * 2
+        df['PhiNOt'] = df['PhiNOt'] * 2
+        visual_phenomics_py.calculate_additional(df, 'LEF')
+        visual_phenomics_py.calculate_additional(df, 'Vx')
+
+        self.assert_values_equal(df['LEF'], self.reference('LEF') * 2, "Phi2 column not reused for LEF")
+        self.assert_values_equal(df['Vx'], self.reference('Vx') * 2, "PhiNOt and qL columns not reused for Vx")
+
+    def test_recalculate_other_constants(self):
+        """
+        Parameters calculated with other constants are calculated again,
+        without changing their columns.
+        """
+        df = self.df.copy()
+        visual_phenomics_py.calculate_many(df, ['Phi2', 'qL', 'PhiNOt'])
+        phinot = df['PhiNOt'].copy()
+
+        visual_phenomics_py.calculate_additional(df, 'Vx', fmf0=4.0)
+
+        self.assert_values_equal(df['Vx'], self.reference('Vx', fmf0=4.0), "PhiNOt not calculated with fmf0=4.0")
+        pd.testing.assert_series_equal(df['PhiNOt'], phinot, check_exact=True)
+        self.assertEqual(df.attrs['calculated']['PhiNOt']['fmf0'], 4.88)
+
+    def test_reuse_imported_columns(self):
+        """
+        Columns that were not calculated (e.g. imported) are always read,
+        whatever the constants.
+        """
+        df = self.df.copy()
+        df['Phi2'] = 0.5
+        df['qL'] = 0.25
+        df['PhiNOt'] = 0.125
+
+        visual_phenomics_py.calculate_additional(df, 'LEF', absorptivity=0.45)
+        visual_phenomics_py.calculate_additional(df, 'Vx', fmf0=4.0)
+
+        self.assert_values_equal(df['LEF'], 0.5 * 0.45 * df['light_intensity'], "Phi2 column not reused for LEF")
+        self.assert_values_equal(df['Vx'], 0.125 * 0.5 * 0.75 * df['light_intensity'], "Columns not reused for Vx")
+
+    def test_intermediates_not_added(self):
+        """
+        Parameters calculated on demand are not added to the DataFrame.
+        """
+        df = self.df.copy()
+        columns = list(df.columns)
+        for param in ADDITIONAL_PARAMETERS:
+            visual_phenomics_py.calculate_additional(df, param)
+
+        self.assertListEqual(list(df.columns), columns + list(ADDITIONAL_PARAMETERS))
+        self.assertCountEqual(df.attrs['calculated'], ADDITIONAL_PARAMETERS)
+
+
+class CalculateCustomTest(TestCase):
+    """
+    Test class corresponding with vppy.calculate_custom
+    """
+
+    def setUp(self):
+        """
+        Import the fixture folder, with the rows in random order.
+        """
+        df = visual_phenomics_py.dataframe(os.path.join(RESOURCE_FOLDER, 'calculate'))
+        self.df = df.iloc[np.random.default_rng(0).permutation(len(df))].copy()
+        del CALLS[:]
+
+    def custom(self, fn, cols, **kwargs):
+        """
+        Calculate a custom parameter and return the column
+        """
+        visual_phenomics_py.calculate_custom(self.df, 'custom', fn, cols=cols, **kwargs)
+        return self.df['custom'].copy()
+
+    def test_auto_fallback(self):
+        """
+        Functions for single values only are called row by row with 'auto'.
+        """
+        expected = self.custom(scalar_ratio, ['fm', 'f0'], fill=['fm', 'f0'], params={'offset': 1})
+        pd.testing.assert_series_equal(
+            self.custom(scalar_ratio, ['fm', 'f0'], fill=['fm', 'f0'], params={'offset': 1}, vectorized='auto'),
+            expected, check_exact=True)
+
+        with self.assertRaises(ValueError):
+            self.custom(scalar_ratio, ['fm', 'f0'], vectorized=True)
+
+    def test_vectorized(self):
+        """
+        Functions called with whole columns, at once or in chunks, give the same
+        values as calling them row by row.
+        """
+        expected = self.custom(ratio, ['fm', 'f0'], fill=['fm', 'f0'], params={'offset': 1})
+        self.assertEqual(max(CALLS), 1)
+
+        for kwargs in [{'vectorized': True}, {'vectorized': 'auto'}, {'vectorized': True, 'chunksize': 5},
+                       {'vectorized': True, 'workers': 2}]:
+            del CALLS[:]
+            values = self.custom(ratio, ['fm', 'f0'], fill=['fm', 'f0'], params={'offset': 1}, **kwargs)
+            np.testing.assert_allclose(values.to_numpy(dtype=float), expected.to_numpy(dtype=float),
+                                       rtol=1e-15, equal_nan=True, err_msg=str(kwargs))
+            if 'chunksize' in kwargs:
+                self.assertListEqual(CALLS, [5, 5, 5, 5, 4])
+
+    def test_length_mismatch(self):
+        """
+        Vectorized functions need to return a value for every row.
+        """
+        with self.assertRaisesRegex(Exception, 'returned 23 value'):
+            self.custom(drop_last, ['fm'], vectorized=True)
+
+    def test_single_value(self):
+        """
+        A single value returned for the columns is used for every row.
+        """
+        expected = self.custom(constant, ['fm'])
+        pd.testing.assert_series_equal(self.custom(constant, ['fm'], vectorized=True), expected, check_exact=True)
+        self.assertTrue((expected == 1.5).all())
+
+    def test_column_types(self):
+        """
+        Booleans are stored as objects and integers as floats, vectorized or not.
+        """
+        for fn, dtype in [(is_high, object), (count_high, float)]:
+            expected = self.custom(fn, ['fs'])
+            self.assertEqual(expected.dtype, dtype)
+            for vectorized in [True, 'auto']:
+                pd.testing.assert_series_equal(self.custom(fn, ['fs'], vectorized=vectorized), expected,
+                                               check_exact=True)
+
+
+class DtypeTest(TestCase):
+    """
+    Test class corresponding with the dtype option of vppy.dataframe and
+    vppy.calculate, and with vppy.check_dtype
+    """
+
+    def setUp(self):
+        """
+        Import the fixture folder as float64 and as float32.
+        """
+        self.path = os.path.join(RESOURCE_FOLDER, 'calculate')
+        self.df = visual_phenomics_py.dataframe(self.path)
+        self.df32 = visual_phenomics_py.dataframe(self.path, dtype='float32')
+
+    def assert_time_columns(self, df):
+        """
+        Assert that the time and light intensity columns are kept as float64
+        """
+        for col in ['time', 'light_intensity', 'day', 'hours_day']:
+            self.assertEqual(df[col].dtype, np.float64, col)
+
+    def test_dataframe(self):
+        """
+        Fluorescence values are imported as the requested type, rounded from the
+        float64 values.
+        """
+        self.assert_time_columns(self.df32)
+        for col in ['fm', 'f0', 'fmp', 'f0p', 'fs', 'fmpp', 'f0pp']:
+            self.assertEqual(self.df32[col].dtype, np.float32, col)
+            pd.testing.assert_series_equal(self.df32[col], self.df[col].astype('float32'), check_exact=True)
+
+    def test_calculate(self):
+        """
+        Calculated parameters are stored as the requested type.
+        """
+        df = self.df32.copy()
+        visual_phenomics_py.calculate(df, 'Phi2', dtype='float32')
+        visual_phenomics_py.calculate_many(df, ['NPQ', 'qL'], dtype='float16')
+        visual_phenomics_py.calculate_additional(df, 'LEF', dtype='float32')
+        visual_phenomics_py.calculate(df, 'Fvfm')
+
+        self.assert_time_columns(df)
+        for param, dtype in [('Phi2', np.float32), ('NPQ', np.float16), ('qL', np.float16), ('LEF', np.float32),
+                             ('Fvfm', np.float64)]:
+            self.assertEqual(df[param].dtype, dtype, param)
+
+        expected = self.df.copy()
+        visual_phenomics_py.calculate_additional(expected, 'LEF')
+        np.testing.assert_allclose(df['LEF'], expected['LEF'], rtol=1e-5, equal_nan=True)
+
+    def test_check_dtype(self):
+        """
+        Every parameter of the fixture is within the tolerance as float32, and
+        the DataFrame is not changed.
+        """
+        columns = list(self.df.columns)
+        result = visual_phenomics_py.check_dtype(self.df, 'float32')
+
+        self.assertCountEqual(result.index, list(PARAMETERS) + list(ADDITIONAL_PARAMETERS))
+        self.assertTrue(result['within'].all(), result)
+        self.assertTrue((result['outside'] == 0).all(), result)
+        self.assertListEqual(list(self.df.columns), columns)
+
+    def test_invalid_dtype(self):
+        """
+        Only floating point types can be requested.
+        """
+        with self.assertRaises(Exception):
+            visual_phenomics_py.dataframe(self.path, dtype='int32')
+        with self.assertRaises(Exception):
+            visual_phenomics_py.calculate(self.df.copy(), 'Phi2', dtype='int32')
@@ -0,0 +1,193 @@
+"""
+Test file corresponding with visual_phenomics_py.dataframe
+"""
+
+import contextlib
+import io
+import os
+import re
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+import visual_phenomics_py as visual_phenomics_py
+
+RESOURCE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources')
+
+# Columns imported as categories
+CATEGORIES = ['sample', 'name', 'position', 'flat', 'experiment', 'camera', 'replicate']
+
+
+def load_expected(filename):
+    """
+    Load a canned DataFrame, sorted by sample and time
+    """
+    df = pd.read_csv(os.path.join(RESOURCE_FOLDER, filename), dtype={col: str for col in CATEGORIES},
+                     keep_default_na=False, na_values=[''], float_precision='round_trip')
+    df[CATEGORIES] = df[CATEGORIES].astype('category')
+    return df
+
+
+class DataframeTest(TestCase):
+    """
+    Test class corresponding with vppy.dataframe
+    """
+
+    def setUp(self):
+        """
+        The fixture folder has files with the sample header (allfm, allf0), the old
+        sample header (allphi2), no sample header (allplain), only missing values
+        (allempty) and a file that is not a parameter file (notes.csv). Values are
+        missing as blanks or text (nan, NaN, n/a, -) and rows without a valid sample
+        are skipped.
+        """
+        self.path = os.path.join(RESOURCE_FOLDER, 'import')
+        self.expected = load_expected('import_expected.csv')
+
+    def assert_imported(self, df):
+        """
+        Assert that an imported DataFrame matches the canned DataFrame, independent
+        of the order the files are listed in
+        """
+        self.assertCountEqual(df.columns, self.expected.columns)
+        df = df.sort_values(['sample', 'time'], kind='stable')[self.expected.columns].reset_index(drop=True)
+        pd.testing.assert_frame_equal(df, self.expected, check_exact=True)
+
+    def test_dataframe(self):
+        """
+        Import the fixture folder and compare it with the canned DataFrame,
+        categorical types included.
+        """
+        self.assert_imported(visual_phenomics_py.dataframe(self.path))
+
+    def test_dataframe_workers(self):
+        """
+        Parsing the files with workers gives the same DataFrame.
+        """
+        self.assert_imported(visual_phenomics_py.dataframe(self.path, workers=2))
+
+
+class CacheTest(TestCase):
+    """
+    Test class corresponding with vppy.dataframe using the import cache
+    """
+
+    def setUp(self):
+        """
+        Copy the import fixture folder, so its files can be changed.
+        """
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'import')
+        shutil.copytree(os.path.join(RESOURCE_FOLDER, 'import'), self.path)
+        self.cache = os.path.join(self.path, '.vppy_cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def assert_cached(self, unchanged, appended, parsed):
+        """
+        Import with the cache, compare with the import without cache and check
+        the number of unchanged, appended and parsed files
+        """
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            df = visual_phenomics_py.dataframe(self.path, cache=True)
+            expected = visual_phenomics_py.dataframe(self.path)
+
+        counts = re.search(r'(\d+) file\(s\) unchanged, (\d+) appended, (\d+) parsed', output.getvalue())
+        self.assertIsNotNone(counts, output.getvalue())
+        self.assertTupleEqual(tuple(map(int, counts.groups())), (unchanged, appended, parsed))
+        pd.testing.assert_frame_equal(df, expected, check_exact=True)
+
+    def change(self, filename, fn):
+        """
+        Rewrite the lines of a file, with a newer modification time
+        """
+        filepath = os.path.join(self.path, filename)
+        mtime = os.stat(filepath).st_mtime_ns
+        with open(filepath, 'r') as file:
+            lines = file.read().splitlines()
+        with open(filepath, 'w') as file:
+            file.write('\n'.join([fn(i, line) for i, line in enumerate(lines)]) + '\n')
+        os.utime(filepath, ns=(mtime + 10**9, mtime + 10**9))
+
+    def test_cache(self):
+        """
+        Import the folder, then touch, append a timepoint to, rewrite a value
+        in and delete a file.
+        """
+        self.assert_cached(0, 0, 5)
+        self.assert_cached(5, 0, 0)
+
+        # Only the modification time changed
+        self.change('allphi2.txt', lambda i, line: line)
+        self.assert_cached(5, 0, 0)
+
+        # New timepoint with a value for every sample and the light intensity
+        self.change('allfm.txt', lambda i, line: line + ('\t48.0' if i == 0 else '\t{0}.5'.format(i)))
+        self.assert_cached(4, 1, 0)
+        self.assert_cached(5, 0, 0)
+
+        # Value changed, with the same file size
+        self.change('allf0.txt', lambda i, line: line.replace('572.5', '573.5'))
+        self.assert_cached(4, 0, 1)
+
+        # Deleted file and its sidecar file
+        os.remove(os.path.join(self.path, 'allplain.txt'))
+        self.assertIn('allplain.txt.npz', os.listdir(self.cache))
+        self.assert_cached(4, 0, 0)
+        self.assertNotIn('allplain.txt.npz', os.listdir(self.cache))
+
+
+class SaveLoadTest(TestCase):
+    """
+    Test class corresponding with vppy.save and vppy.load for the npy format
+    """
+
+    def setUp(self):
+        """
+        Import the calculation fixture folder, calculate Phi2 (recorded in the
+        attributes) and add a text column with missing values.
+        """
+        self.df = visual_phenomics_py.dataframe(os.path.join(RESOURCE_FOLDER, 'calculate'))
+        visual_phenomics_py.calculate(self.df, 'Phi2')
+        self.df['note'] = np.where(self.df['time'] < 24, 'first', None)
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_npy_round_trip(self):
+        """
+        Save and load all columns, read or memory-mapped.
+        """
+        filepath = visual_phenomics_py.save(self.df, self.folder, format='npy')
+        self.assertEqual(filepath, os.path.join(self.folder, 'dataframe'))
+
+        for mmap in [False, True]:
+            df = visual_phenomics_py.load(filepath, mmap=mmap)
+            pd.testing.assert_frame_equal(df, self.df, check_exact=True, obj='mmap={0}'.format(mmap))
+            self.assertDictEqual(df.attrs, self.df.attrs)
+
+    def test_npy_columns_and_filters(self):
+        """
+        Load selected columns and rows only.
+        """
+        filepath = visual_phenomics_py.save(self.df, self.folder, format='npy')
+
+        df = visual_phenomics_py.load(filepath, columns=['sample', 'time', 'Phi2'], name='Mut-1', day=[2])
+        expected = self.df[(self.df['name'] == 'Mut-1') & (self.df['day'] == 2)][['sample', 'time', 'Phi2']]
+        pd.testing.assert_frame_equal(df, expected.reset_index(drop=True), check_exact=True)
+
+    def test_npy_save_again(self):
+        """
+        Saving again replaces the previously saved columns.
+        """
+        visual_phenomics_py.save(self.df, self.folder, format='npy')
+        filepath = visual_phenomics_py.save(self.df[['sample', 'time', 'fm']], self.folder, format='npy')
+
+        pd.testing.assert_frame_equal(visual_phenomics_py.load(filepath), self.df[['sample', 'time', 'fm']],
+                                      check_exact=True)
+        self.assertCountEqual(os.listdir(filepath), ['metadata.json', '0.npy', '1.npy', '2.npy'])
@@ -0,0 +1,97 @@
+"""
+Test file corresponding with visual_phenomics_py.export
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import pandas as pd
+
+import visual_phenomics_py as visual_phenomics_py
+
+RESOURCE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources')
+
+
+def read_lines(filename):
+    """
+    Read the lines of a text file
+    """
+    with open(filename, 'r') as file:
+        return file.read().splitlines()
+
+
+class ExportTest(TestCase):
+    """
+    Test class corresponding with vppy.to_txt, vppy.to_npz and vppy.npz_to_txt
+    """
+
+    def setUp(self):
+        """
+        Import the calculation fixture folder and calculate Phi2, so the exported
+        values are not only the imported ones.
+        """
+        self.df = visual_phenomics_py.dataframe(os.path.join(RESOURCE_FOLDER, 'calculate'))
+        visual_phenomics_py.calculate(self.df, 'Phi2')
+        self.expected = os.path.join(RESOURCE_FOLDER, 'export')
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def assert_exported(self, folder):
+        """
+        Assert that the exported files match the canned files
+        """
+        self.assertCountEqual(os.listdir(folder), os.listdir(self.expected))
+        for filename in os.listdir(self.expected):
+            self.assertListEqual(read_lines(os.path.join(folder, filename)),
+                                 read_lines(os.path.join(self.expected, filename)),
+                                 "to_txt() result \"{0}\" does not match the canned file".format(filename))
+
+    def test_to_txt(self):
+        """
+        Export all columns and compare them with the canned files.
+        """
+        visual_phenomics_py.to_txt(self.df, self.folder)
+        self.assert_exported(self.folder)
+
+    def test_to_txt_workers(self):
+        """
+        Exporting with workers gives the same files.
+        """
+        visual_phenomics_py.to_txt(self.df, self.folder, workers=2)
+        self.assert_exported(self.folder)
+
+    def test_npz_round_trip(self):
+        """
+        Import a bundle and compare it with the exported DataFrame.
+        """
+        expected = self.df.sort_values(['sample', 'time']).reset_index(drop=True)
+        for compress in [True, False]:
+            filepath = visual_phenomics_py.to_npz(self.df, os.path.join(self.folder, 'bundle'), compress=compress)
+            self.assertEqual(filepath, os.path.join(self.folder, 'bundle.npz'))
+
+            df = visual_phenomics_py.dataframe(filepath)
+            self.assertCountEqual(df.columns, expected.columns)
+            df = df.sort_values(['sample', 'time']).reset_index(drop=True)[expected.columns]
+            pd.testing.assert_frame_equal(df, expected, check_exact=True, obj='compress={0}'.format(compress))
+
+    def test_npz_to_txt(self):
+        """
+        Text files converted from a bundle match the canned files.
+        """
+        filepath = visual_phenomics_py.to_npz(self.df, os.path.join(self.folder, 'bundle.npz'))
+        folder = os.path.join(self.folder, 'txt')
+        visual_phenomics_py.npz_to_txt(filepath, folder)
+        self.assert_exported(folder)
+
+    def test_to_txt_changed_in_place(self):
+        """
+        Light intensities changed in place after an export are exported.
+        """
+        visual_phenomics_py.to_txt(self.df, self.folder, cols=['fm'])
+        self.df.loc[:, 'light_intensity'] = 999.0
+        visual_phenomics_py.to_txt(self.df, self.folder, cols=['fm'])
+        self.assertEqual(read_lines(os.path.join(self.folder, 'allfm.txt'))[-1], '*light_intensity\t999.0\t999.0')
@@ -5,22 +5,29 @@ DataFrame.
 
 See :func:`~visual_phenomics_py.buildframe.dataframe`
 See :func:`~visual_phenomics_py.calculate.calculate`
+See :func:`~visual_phenomics_py.calculate.calculate_many`
 See :func:`~visual_phenomics_py.calculate.calculate_additional`
 See :func:`~visual_phenomics_py.calculate.calculate_custom`
+See :func:`~visual_phenomics_py.calculate.sweep`
+See :func:`~visual_phenomics_py.calculate.check_dtype`
 See :func:`~visual_phenomics_py.about.info`
 See :func:`~visual_phenomics_py.about.samples`
 See :func:`~visual_phenomics_py.about.description`
+See :func:`~visual_phenomics_py.about.summary`
 See :func:`~visual_phenomics_py.plot.plot`
 See :func:`~visual_phenomics_py.plot.plot_light`
+See :func:`~visual_phenomics_py.plot.render_figures`
 See :func:`~visual_phenomics_py.labels.label`
+See :class:`~visual_phenomics_py.accessor.VisualPhenomicsAccessor`
 
 See the online readme for more information: https://github.com/SeBassTian23/Visual-Phenomics-Python
 """
 
 from visual_phenomics_py.dataframe import dataframe, save, load
-from visual_phenomics_py.export import to_txt
-from visual_phenomics_py.calculate import calculate, calculate_additional, calculate_custom
-from visual_phenomics_py.about import info, samples, description, version
-from visual_phenomics_py.plot import plot, plot_light, heatmap
+from visual_phenomics_py.export import to_txt, to_npz, npz_to_txt
+from visual_phenomics_py.calculate import calculate, calculate_many, calculate_additional, calculate_custom, sweep, check_dtype
+from visual_phenomics_py.about import info, samples, description, summary, version
+from visual_phenomics_py.plot import plot, plot_light, heatmap, render_figures
 from visual_phenomics_py.labels import label
+from visual_phenomics_py.accessor import VisualPhenomicsAccessor
 import visual_phenomics_py.util as util
\ No newline at end of file
@@ -2,8 +2,82 @@
 Get info from the DataFrame with Visual Phenomics data. 
 """
 
+import numpy as np
+import pandas as pd
 import pkg_resources
 
+# Columns the summary of a DataFrame is based on
+SUMMARY_COLUMNS = ['experiment', 'sample', 'name', 'folder', 'time', 'light_intensity']
+
+
+def _summary(df):
+    """Summary of the DataFrame, see summary
+
+    Every column is read once. The unique values are determined first and the
+    counts, time span and light intensity for each experiment are calculated
+    from their codes.
+
+    :param df: DataFrame
+    :returns: summary (dict)
+    """
+
+    summary = {'rows': len(df), 'experiments': None}
+
+    # Rows without experiment are part of the totals only
+    groups = np.zeros(len(df), dtype=np.intp)
+    if 'experiment' in df:
+        groups, summary['experiments'] = pd.factorize(df['experiment'].values)
+        groups = np.where(groups < 0, len(summary['experiments']), groups)
+
+    size = (len(summary['experiments']) if summary['experiments'] is not None else 0) + 1
+    per_experiment = pd.DataFrame({'rows': np.bincount(groups, minlength=size)})
+
+    # Unique values and the number of them for each experiment
+    for col, key in [('sample', 'samples'), ('name', 'names'), ('folder', 'folders')]:
+        summary[key] = None
+        if col in df:
+            codes, summary[key] = pd.factorize(df[col].values)
+            seen = np.zeros((size, len(summary[key])), dtype=bool)
+            seen[groups[codes >= 0], codes[codes >= 0]] = True
+            per_experiment[key] = seen.sum(axis=1)
+
+    # Time span and light intensity for each experiment
+    for col, aggregations in [('time', {'start': 'min', 'end': 'max'}), ('light_intensity', {'light_max': 'max'})]:
+        for key in aggregations:
+            summary[key] = None
+        if col in df:
+            values = pd.Series(df[col].to_numpy()).groupby(groups).agg(list(aggregations.values()))
+            for key, fn in aggregations.items():
+                per_experiment[key] = values[fn].reindex(range(size)).to_numpy()
+                summary[key] = getattr(values[fn], fn)()
+
+    summary['per_experiment'] = None
+    if summary['experiments'] is not None:
+        per_experiment = per_experiment.iloc[:-1]
+        per_experiment.index = pd.Index(summary['experiments'], name='experiment')
+        summary['per_experiment'] = per_experiment
+
+    return summary
+
+
+def summary(df=None):
+    """Summary of the experiments in the DataFrame.
+
+    The number of rows, the unique experiments, samples, names and folders (in
+    order of appearance, None if the column is missing), the first and last time,
+    the maximum light intensity and the same counts for each experiment. Every
+    column is read once, use df.vp.summary to keep the summary with the DataFrame.
+
+    :param df: DataFrame
+    :returns: summary (dict)
+    """
+
+    if df is None:
+        raise Exception('No DataFrame selected.')
+
+    return _summary(df)
+
+
 def info(df=None):
     """Print DataFrame Information.
 
@@ -13,6 +87,12 @@ def info(df=None):
     if df is None:
         raise Exception('No DataFrame selected.')
 
+    overview = _summary(df)
+    counts = ['{0} {1}'.format(len(overview[key]), key) for key in ['experiments', 'samples', 'names', 'folders']
+              if overview[key] is not None]
+    if len(counts) > 0:
+        print('Visual Phenomics: {0}'.format(", ".join(counts)))
+
     df.info(memory_usage='deep')
 
 
@@ -31,7 +111,7 @@ def samples(df=None):
     if 'name' not in df:
         raise Exception('Column "name" not found.')
 
-    return df['name'].unique()
+    return _summary(df)['names']
 
 
 def description(df=None):
@@ -52,24 +132,26 @@ def description(df=None):
         if col not in df:
             raise Exception('Column "%s" is required but not found.' % col)
 
+    overview = _summary(df)
+
     light = 'n/a'
-    if 'light_intensity' in df:
-        light = df['light_intensity'].max()
+    if overview['light_max'] is not None:
+        light = overview['light_max']
 
     folders = ""
-    if 'folder' in df:
-        folders = ", combined from {0} folder(s) [{1}]".format(len(df['folder'].unique()), ", ".join(df['folder'].unique().tolist()))
+    if overview['folders'] is not None:
+        folders = ", combined from {0} folder(s) [{1}]".format(len(overview['folders']), ", ".join(overview['folders'].tolist()))
 
     description = 'The current DataFrame contains {0} experiment(s) with {1} sample(s) of {2} individual lines{8}. The duration of the experiment was {4} hours ({5} day(s)) with a maximum light intensity of {6} uE.\n\n# Lines:\n{3}\n\n# Experiments:\n{7}'.format(
-        len(df['experiment'].unique()),
-        len(df['sample'].unique()),
-        len(df['name'].unique()),
-        ", ".join(sorted(df['name'].unique().tolist(), key=str.casefold)),
-        df['time'].max(),
-        (df['time'].max()/24),
+        len(overview['experiments']),
+        len(overview['samples']),
+        len(overview['names']),
+        ", ".join(sorted(overview['names'].tolist(), key=str.casefold)),
+        overview['end'],
+        (overview['end']/24),
         light,
         ", ".join(
-            sorted(df['experiment'].unique().tolist(), key=str.casefold)),
+            sorted(overview['experiments'].tolist(), key=str.casefold)),
         folders
     )
     print(description)
@@ -0,0 +1,196 @@
+"""
+Visual Phenomics functions as a pandas DataFrame accessor (df.vp).
+"""
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from visual_phenomics_py.dataframe import save, _sort_order
+from visual_phenomics_py.export import _to_txt, _to_npz, _light_intensities
+from visual_phenomics_py.calculate import calculate, calculate_many, calculate_additional, calculate_custom, sweep, check_dtype
+from visual_phenomics_py.about import info, samples, description, _summary, SUMMARY_COLUMNS
+from visual_phenomics_py.plot import _plot_figure, plot_light, heatmap, render_figures
+
+
+def _column_state(df, col):
+    """State of a column to detect changes
+
+    A column is unchanged as long as it uses the same data. The array is
+    returned as well, so its memory is not reused while it is compared.
+
+    :param df: DataFrame
+    :param col: Column name
+    :returns: state (tuple) and array
+    """
+
+    if col not in df:
+        return None, None
+
+    values = df[col].array
+    if isinstance(values, pd.Categorical):
+        arr = values.codes
+    else:
+        arr = df[col].to_numpy()
+
+    return (col, arr.__array_interface__['data'][0], arr.shape, arr.strides, df[col].dtype), arr
+
+
+@pd.api.extensions.register_dataframe_accessor('vp')
+class VisualPhenomicsAccessor:
+    """Visual Phenomics functions for a DataFrame
+
+    Available as df.vp for every DataFrame once the package is imported, e.g.
+    df.vp.calculate('Phi2') instead of calculate(df, 'Phi2'). Facts derived from
+    the DataFrame (samples, times, light intensities, days and sort order) are
+    kept until the rows or the columns they depend on change. Values changed in
+    place (e.g. with df.loc) are not detected, use clear in that case.
+
+    :param df: DataFrame
+    """
+
+    def __init__(self, df):
+        self._df = df
+        self._cache = {}
+
+    def _cached(self, key, cols, fn):
+        """Value derived from columns of the DataFrame, calculated once
+
+        :param key: Name of the value
+        :param cols: Columns the value depends on
+        :param fn: Function calculating the value
+        :returns: value
+        """
+
+        states = [_column_state(self._df, col) for col in cols]
+        fingerprint = (len(self._df), [state for state, arr in states])
+
+        if key in self._cache and self._cache[key][0] == fingerprint:
+            return self._cache[key][2]
+
+        value = fn()
+        self._cache[key] = (fingerprint, [arr for state, arr in states], value)
+
+        return value
+
+    def clear(self):
+        """Forget the derived values, e.g. after changing values in place
+        """
+        self._cache = {}
+
+    @property
+    def sort_order(self):
+        """Row positions sorted by sample and time (array)
+        """
+        return _sort_order(self._df)
+
+    @property
+    def times(self):
+        """Sorted unique times (array)
+        """
+        return self._cached('times', ['time'], lambda: np.sort(self._df['time'].unique()))
+
+    @property
+    def light_intensities(self):
+        """Light intensity for each time, with the time as string (dict)
+        """
+        return dict(self._cached('light_intensities', ['time', 'light_intensity'],
+                                 lambda: _light_intensities(self._df)))
+
+    @property
+    def day_bounds(self):
+        """First and last time of each day (DataFrame)
+        """
+        return self._cached('day_bounds', ['day', 'time'],
+                            lambda: self._df.groupby('day')['time'].agg(['min', 'max'])).copy()
+
+    def summary(self):
+        """Summary of the experiments, see :func:`~visual_phenomics_py.about.summary`
+        """
+        overview = dict(self._cached('summary', SUMMARY_COLUMNS, lambda: _summary(self._df)))
+        if overview['per_experiment'] is not None:
+            overview['per_experiment'] = overview['per_experiment'].copy()
+        return overview
+
+    def samples(self):
+        """Unique sample names, see :func:`~visual_phenomics_py.about.samples`
+        """
+        return samples(self._df)
+
+    def info(self):
+        """See :func:`~visual_phenomics_py.about.info`
+        """
+        info(self._df)
+
+    def description(self):
+        """See :func:`~visual_phenomics_py.about.description`
+        """
+        description(self._df)
+
+    def calculate(self, param='', **kwargs):
+        """See :func:`~visual_phenomics_py.calculate.calculate`
+        """
+        calculate(self._df, param, **kwargs)
+
+    def calculate_many(self, params=[], **kwargs):
+        """See :func:`~visual_phenomics_py.calculate.calculate_many`
+        """
+        calculate_many(self._df, params, **kwargs)
+
+    def calculate_additional(self, param='', **kwargs):
+        """See :func:`~visual_phenomics_py.calculate.calculate_additional`
+        """
+        calculate_additional(self._df, param, **kwargs)
+
+    def calculate_custom(self, name='', fn=None, **kwargs):
+        """See :func:`~visual_phenomics_py.calculate.calculate_custom`
+        """
+        calculate_custom(self._df, name, fn, **kwargs)
+
+    def sweep(self, params=[], **kwargs):
+        """See :func:`~visual_phenomics_py.calculate.sweep`
+        """
+        return sweep(self._df, params, **kwargs)
+
+    def check_dtype(self, dtype='float32', **kwargs):
+        """See :func:`~visual_phenomics_py.calculate.check_dtype`
+        """
+        return check_dtype(self._df, dtype, **kwargs)
+
+    def plot(self, param=None, **kwargs):
+        """See :func:`~visual_phenomics_py.plot.plot`, using the kept times
+        """
+        if len(kwargs.get('days', [])) > 0 and 'time' in self._df:
+            kwargs['times'] = self.times
+        _plot_figure(self._df, param, **kwargs)
+        plt.show()
+
+    def plot_light(self):
+        """See :func:`~visual_phenomics_py.plot.plot_light`
+        """
+        plot_light(self._df)
+
+    def heatmap(self, param='', **kwargs):
+        """See :func:`~visual_phenomics_py.plot.heatmap`
+        """
+        heatmap(self._df, param, **kwargs)
+
+    def render_figures(self, specs=[], folder=None, **kwargs):
+        """See :func:`~visual_phenomics_py.plot.render_figures`
+        """
+        return render_figures(self._df, specs, folder, **kwargs)
+
+    def to_txt(self, folder=None, **kwargs):
+        """See :func:`~visual_phenomics_py.export.to_txt`, using the kept light intensities
+        """
+        _to_txt(self._df, folder, light_and_times=self.light_intensities, **kwargs)
+
+    def to_npz(self, filepath=None, **kwargs):
+        """See :func:`~visual_phenomics_py.export.to_npz`, using the kept light intensities
+        """
+        return _to_npz(self._df, filepath, light_and_times=self.light_intensities, **kwargs)
+
+    def save(self, path=None, **kwargs):
+        """See :func:`~visual_phenomics_py.dataframe.save`
+        """
+        return save(self._df, path, **kwargs)
@@ -2,18 +2,634 @@
 Calculate additional parameters or recalculate parameters.
 """
 
-from visual_phenomics_py.util.parameters import fvfm, npq, npqt, phi2, phino, phinot, phinpq, phinpqt, qe, qesv, qet, qi, qit, ql, qp
-from visual_phenomics_py.util.parameters_additional import lef, vx, sphi2, sphinpq
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import io
+from multiprocessing.shared_memory import SharedMemory
+import time
 
+import numpy as np
+from numpy import nan
+import pandas as pd
 
-def calculate(df=None, param='', *, fm='fm', f0='f0', fmp='fmp', f0p='f0p', fs='fs', fmpp='fmpp', f0pp='f0pp', fmf0=4.88, alias=None):
+from visual_phenomics_py.util.parameters import fvfm, npq, npqt, phi2, qe, qesv, qi, qit, ql, qp
+from visual_phenomics_py.util.parameters import phino_from_npq, phinot_from_npqt, phinpq_from_phi2, qet_from_npqt
+from visual_phenomics_py.util.parameters_additional import lef, vx, sphi2, sphinpq, deltanpq
+from visual_phenomics_py.dataframe import _load_npy, _npy_create, _npy_add, _sort_order, _float_dtype
+
+
+# Function, inputs and constants for each parameter. Inputs are either
+# fluorescence columns (fm, f0, fmp, f0p, fs, fmpp, f0pp) or other parameters,
+# so shared intermediates like qL, NPQt or Phi2 are only calculated once.
+PARAMETERS = {
+    'Fvfm': (fvfm, ['fm', 'f0'], []),
+    'NPQ': (npq, ['fm', 'fmp'], []),
+    'NPQt': (npqt, ['fmp', 'f0p'], ['fmf0']),
+    'Phi2': (phi2, ['fmp', 'fs'], []),
+    'PhiNO': (phino_from_npq, ['NPQ', 'qL', 'fm', 'f0'], []),
+    'PhiNOt': (phinot_from_npqt, ['NPQt', 'qL'], ['fmf0']),
+    'PhiNPQ': (phinpq_from_phi2, ['Phi2', 'PhiNO'], []),
+    'PhiNPQt': (phinpq_from_phi2, ['Phi2', 'PhiNOt'], []),
+    'qE': (qe, ['fmpp', 'fmp'], []),
+    'qEsv': (qesv, ['fm', 'fmp', 'fmpp'], []),
+    'qEt': (qet_from_npqt, ['NPQt', 'qIt'], []),
+    'qI': (qi, ['fm', 'fmpp'], []),
+    'qIt': (qit, ['fmpp', 'f0pp'], ['fmf0']),
+    'qL': (ql, ['fmp', 'fs', 'f0p'], []),
+    'qP': (qp, ['fmp', 'fs', 'f0p'], []),
+}
+
+
+# Function, inputs and constants for each additional parameter. Inputs are
+# the parameters above or the light intensity.
+ADDITIONAL_PARAMETERS = {
+    'LEF': (lef, ['Phi2', 'light_intensity'], ['absorptivity']),
+    'Vx': (vx, ['PhiNOt', 'qL', 'light_intensity'], ['absorptivity']),
+    'SPhi2': (sphi2, ['Phi2', 'PhiNOt', 'qL'], ['phinoopt', 'fmf0']),
+    'SNPQ': (sphinpq, ['Phi2', 'PhiNOt', 'qL'], ['phinoopt', 'fmf0']),
+    'deltaNPQ': (deltanpq, ['PhiNOt'], ['phinoopt']),
+}
+
+_GRAPH = dict(PARAMETERS, **ADDITIONAL_PARAMETERS)
+
+# Default number of samples per chunk for DataFrames saved in the npy format
+CHUNK_SAMPLES = 500
+
+# Number of rows read at once when looking for the values carried into a partition
+_CARRY_BLOCK = 1024
+
+
+def _constants(param):
+    """List the constants used by a parameter and its dependencies
+
+    :param param: Parameter name
+    :returns: constant names (list)
+    """
+
+    fn, inputs, consts = _GRAPH[param]
+    names = list(consts)
+    for name in inputs:
+        if name in _GRAPH:
+            names += [c for c in _constants(name) if c not in names]
+    return names
+
+
+def _record(param, constants):
+    """Record how a parameter column was calculated
+
+    :param param: Parameter name
+    :param constants: Constants used for the calculation
+    :returns: record (dict)
+    """
+
+    return dict({'param': param}, **{c: constants[c] for c in _constants(param)})
+
+
+def _is_valid(df, col, constants):
+    """Check if a parameter column can be used with the given constants
+
+    Columns not calculated by this package (e.g. imported) are always valid.
+    Calculated columns are valid if they were calculated with the same constants.
+
+    :param df: DataFrame
+    :param col: Column name
+    :param constants: Constants for the current calculation
+    :returns: True if valid (bool)
+    """
+
+    record = df.attrs.get('calculated', {}).get(col)
+    if record is None:
+        return True
+    return all([record[c] == constants[c] for c in record if c in constants])
+
+
+def _plan(df, params, bindings={}, reuse=False, constants={}):
+    """Plan the calculation of parameters
+
+    Turn the requested parameters into the parameters that need to be calculated,
+    dependencies first, and the columns that need to be read from the DataFrame.
+    Each parameter is planned once, even if it is needed by multiple parameters.
+    With reuse, dependencies that already exist as valid columns are read instead
+    of calculated again.
+
+    :param df: DataFrame
+    :param params: Parameter names
+    :param bindings: Column names used for inputs (e.g. {'fm': 'FM'})
+    :param reuse: Use existing columns for dependencies (default False)
+    :param constants: Constants to check existing columns against
+    :returns: parameters to calculate (list), columns to read (list), missing inputs (list)
+    """
+
+    nodes = []
+    cols = []
+    missing = []
+
+    def visit(param):
+        for name in _GRAPH[param][1]:
+            col = bindings.get(name, name)
+            if (col in nodes) or (col in cols) or (name in missing):
+                continue
+            if (col in df) and ((col not in _GRAPH) or (reuse and _is_valid(df, col, constants))):
+                cols.append(col)
+            elif col in _GRAPH:
+                visit(col)
+            else:
+                missing.append(name)
+        nodes.append(param)
+
+    for param in params:
+        if param not in nodes:
+            visit(param)
+
+    return nodes, cols, missing
+
+
+def _evaluate(df_tmp, nodes, bindings, constants):
+    """Calculate parameters from the columns of a DataFrame
+
+    Every parameter is calculated once on the whole columns. Columns stored
+    with half precision (float16) are calculated with single precision.
+
+    :param df_tmp: DataFrame with the input columns
+    :param nodes: Parameters to calculate, dependencies first (see _plan)
+    :param bindings: Column names used for inputs
+    :param constants: Constants passed to the functions (e.g. fmf0)
+    :returns: calculated parameters (dict)
+    """
+
+    values = {}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for node in nodes:
+            fn, inputs, consts = _GRAPH[node]
+            args = []
+            for name in inputs:
+                col = bindings.get(name, name)
+                if col not in values:
+                    values[col] = df_tmp[col].to_numpy()
+                    if values[col].dtype == np.float16:
+                        values[col] = values[col].astype(np.float32)
+                args.append(values[col])
+            values[node] = fn(*args, *[constants[c] for c in consts])
+
+    return values
+
+
+def _write(df, col, values, index, record=None, dtype=float):
+    """Write a calculated column to the DataFrame
+
+    :param df: DataFrame
+    :param col: Column name
+    :param values: Calculated values
+    :param index: Index of the values
+    :param record: How the column was calculated (see _record)
+    :param dtype: Column type (default float)
+    """
+
+    df[col] = pd.Series(values, index=index, dtype=dtype)
+
+    records = dict(df.attrs.get('calculated', {}))
+    if record is None:
+        if col not in records:
+            return
+        del records[col]
+    else:
+        records[col] = record
+    df.attrs['calculated'] = records
+
+
+def _enumerate(names):
+    """Join names to a readable enumeration ("a and b", "a, b, and c")."""
+    if len(names) < 3:
+        return " and ".join(names)
+    return "{0}, and {1}".format(", ".join(names[:-1]), names[-1])
+
+
+def _sorted_columns(df, cols, fill=[]):
+    """Select columns sorted by sample and time
+
+    Only the selected columns are copied from the DataFrame, using the row
+    order kept with the DataFrame (see dataframe._sort_order). Columns listed
+    in fill are forward filled (if selected).
+
+    :param df: DataFrame
+    :param cols: Column names to select
+    :param fill: Column names to forward fill
+    :returns: DataFrame sorted by sample and time
+    """
+
+    selection = list(dict.fromkeys(['sample', 'time'] + list(cols)))
+    df_tmp = df.iloc[_sort_order(df), df.columns.get_indexer(selection)]
+
+    fill = [col for col in dict.fromkeys(fill) if col in cols]
+    if len(fill) > 0:
+        df_tmp[fill] = df_tmp[fill].ffill()
+
+    return df_tmp
+
+
+def _source(df):
+    """DataFrame to calculate parameters from
+
+    :param df: DataFrame or folder with a DataFrame saved in the npy format
+    :returns: DataFrame (memory-mapped for saved DataFrames)
+    """
+
+    if isinstance(df, str):
+        return _load_npy(df, mmap=True)
+    return df
+
+
+def _partitions(df, chunk_samples=None, workers=None):
+    """Sort rows by sample and time and split them into partitions of samples
+
+    Without chunk_samples, the samples are split into four partitions per worker.
+
+    :param df: DataFrame
+    :param chunk_samples: Number of samples per partition (default None)
+    :param workers: Number of worker processes (default None)
+    :returns: row order, row bounds of the partitions and samples per partition
+    """
+
+    codes = pd.factorize(df['sample'])[0]
+    order = _sort_order(df)
+
+    # First row of each sample
+    starts = np.append(0, np.flatnonzero(np.diff(codes[order])) + 1)
+
+    if chunk_samples is None:
+        chunk_samples = max(1, int(np.ceil(len(starts) / (4 * workers))))
+
+    bounds = np.append(starts[::int(chunk_samples)], len(order))
+
+    return order, bounds, int(chunk_samples)
+
+
+def _carry(arrays, order, bounds, cols, fill=[]):
+    """Values carried forward into each partition
+
+    The last value before the first row of each partition, so forward filling
+    the partitions one by one gives the same values as forward filling all rows
+    at once (see _sorted_columns).
+
+    :param arrays: Columns (dict)
+    :param order: Row order (see _partitions)
+    :param bounds: Row bounds of the partitions (see _partitions)
+    :param cols: Column names selected
+    :param fill: Column names to forward fill
+    :returns: values for each partition (list of dict)
+    """
+
+    carry = [{} for _ in bounds[:-1]]
+    for col in dict.fromkeys(fill):
+        if col not in cols:
+            continue
+        values = arrays[col]
+        for i in range(1, len(bounds) - 1):
+            # Scan the previous partition backwards in blocks, so only the rows
+            # up to the last value are read, else use the value carried into it
+            value = carry[i - 1].get(col, np.nan)
+            end = bounds[i]
+            while end > bounds[i - 1]:
+                start = max(bounds[i - 1], end - _CARRY_BLOCK)
+                block = values[order[start:end]]
+                found = np.flatnonzero(pd.notna(block))
+                if len(found) > 0:
+                    value = block[found[-1]]
+                    break
+                end = start
+            carry[i][col] = value
+    return carry
+
+
+def _partition_frame(arrays, rows, cols, fill=[], local={}, carry={}):
+    """Select rows of columns, forward filling columns
+
+    :param arrays: Columns (dict)
+    :param rows: Rows to select, sorted by sample and time
+    :param cols: Column names to select
+    :param fill: Column names to forward fill
+    :param local: Columns already reduced to the selected rows (dict)
+    :param carry: Values carried forward from the previous partition (see _carry)
+    :returns: DataFrame
+    """
+
+    df_tmp = pd.DataFrame({col: local[col] if col in local else arrays[col][rows] for col in cols})
+
+    fill = [col for col in dict.fromkeys(fill) if col in cols]
+    if len(fill) > 0:
+        df_tmp[fill] = df_tmp[fill].ffill()
+        carry = {col: value for col, value in carry.items() if col in fill and pd.notna(value)}
+        if len(carry) > 0:
+            df_tmp[fill] = df_tmp[fill].fillna(carry)
+
+    return df_tmp
+
+
+def _share(arrays):
+    """Copy arrays to shared memory for worker processes
+
+    Memory-mapped arrays of a .npy file are shared as the file instead.
+
+    :param arrays: Numeric arrays (dict)
+    :returns: shared memory blocks (list), description of the shared arrays (dict)
+    """
+
+    blocks = []
+    specs = {}
+    for key, arr in arrays.items():
+        if isinstance(arr, np.memmap) and arr.filename is not None:
+            arr.flush()
+            specs[key] = ('npy', arr.filename)
+            continue
+        block = SharedMemory(create=True, size=max(arr.nbytes, 1))
+        blocks.append(block)
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf)[...] = arr
+        specs[key] = ('shm', block.name, arr.shape, arr.dtype.str)
+    return blocks, specs
+
+
+def _attach(specs):
+    """Access arrays shared with _share
+
+    :param specs: Description of the shared arrays (dict)
+    :returns: shared memory blocks and memory-mapped files (list), arrays (dict)
+    """
+
+    handles = []
+    arrays = {}
+    for key, spec in specs.items():
+        if spec[0] == 'npy':
+            arrays[key] = np.load(spec[1], mmap_mode='r+')
+            handles.append(arrays[key])
+        else:
+            block = SharedMemory(name=spec[1])
+            handles.append(block)
+            arrays[key] = np.ndarray(spec[2], dtype=spec[3], buffer=block.buf)
+    return handles, arrays
+
+
+def _release(handles, unlink=False):
+    """Release arrays shared with _share or accessed with _attach
+
+    :param handles: Shared memory blocks and memory-mapped files
+    :param unlink: Free the shared memory (default False)
+    """
+
+    for handle in handles:
+        if isinstance(handle, np.memmap):
+            handle.flush()
+            continue
+        try:
+            handle.close()
+        except BufferError:
+            # Still referenced (e.g. by a traceback), closed with the process
+            pass
+        if unlink:
+            handle.unlink()
+
+
+def _attach_columns(columns, cols):
+    """Access the input columns in a worker process
+
+    :param columns: Description of the shared columns (see _share) or folder with a DataFrame saved in the npy format
+    :param cols: Column names
+    :returns: shared memory blocks (list), columns (dict)
+    """
+
+    if isinstance(columns, str):
+        df = _load_npy(columns, columns=[col for col in dict.fromkeys(cols)], mmap=True)
+        return [], {col: df[col].to_numpy() for col in df.columns}
+    return _attach(columns)
+
+
+def _evaluate_partition(index, columns, outputs, start, end, local, carry, nodes, cols, bindings, constants, fill):
+    """Calculate parameters for a partition of samples in a worker process
+
+    :param index: Row order (see _share)
+    :param columns: Input columns (see _attach_columns)
+    :param outputs: Arrays to write the results to (see _share)
+    :param start: First row of the partition in the row order
+    :param end: Row after the partition in the row order
+    :param local: Columns already reduced to the rows of the partition (dict)
+    :param carry: Values carried forward from the previous partition (see _carry)
+    :param nodes: Parameters to calculate, dependencies first (see _plan)
+    :param cols: Columns to read (see _plan)
+    :param bindings: Column names used for inputs
+    :param constants: Constants passed to the functions (e.g. fmf0)
+    :param fill: Column names to forward fill
+    """
+
+    handles, arrays = _attach(index)
+    handles_cols, data = _attach_columns(columns, [col for col in cols if col not in local])
+    handles_out, out = _attach(outputs)
+
+    try:
+        rows = arrays['order'][start:end]
+        df_tmp = _partition_frame(data, rows, cols, fill, local, carry)
+        values = _evaluate(df_tmp, nodes, bindings, constants)
+        for param in out:
+            out[param][rows] = values[param]
+    finally:
+        del arrays, data, out
+        _release(handles + handles_cols + handles_out)
+
+
+def _custom_partition(index, columns, start, end, local, carry, fn, cols, fill, params, vectorized, chunksize):
+    """Calculate a custom parameter for a partition of samples in a worker process
+
+    See _evaluate_partition for the arguments and calculate_custom for the function
+    and its options.
+
+    :returns: calculated values and whether the function was called row by row
+    """
+
+    handles, arrays = _attach(index)
+    handles_cols, data = _attach_columns(columns, [col for col in cols if col not in local])
+
+    try:
+        rows = arrays['order'][start:end]
+        df_tmp = _partition_frame(data, rows, cols, fill, local, carry)
+        return _custom_values(df_tmp, end - start, fn, cols, params, vectorized, chunksize)
+    finally:
+        del arrays, data
+        _release(handles + handles_cols)
+
+
+def _run_partitions(fn, df, columns, cols, order, bounds, carry, outputs, workers, *args):
+    """Run a function for each partition of samples in a process pool
+
+    Row order, numeric columns and outputs are shared with the worker
+    processes instead of being passed on for each partition. Other columns are passed
+    on with only the rows of the partition.
+
+    :param fn: Function to run (e.g. _evaluate_partition)
+    :param df: DataFrame with the columns
+    :param columns: Folder with a DataFrame saved in the npy format to read the columns from (or None)
+    :param cols: Columns to read
+    :param order: Row order (see _partitions)
+    :param bounds: Row bounds of the partitions (see _partitions)
+    :param carry: Values carried forward into each partition (see _carry)
+    :param outputs: Arrays to write the results to (dict or None)
+    :param workers: Number of worker processes
+    :param args: Arguments passed on to the function
+    :returns: results for each partition (list)
+    """
+
+    arrays = {col: df[col].to_numpy() for col in dict.fromkeys(cols)}
+    other = [col for col in arrays if arrays[col].dtype.kind not in 'biuf']
+
+    handles = []
+    try:
+        blocks, index = _share({'order': order})
+        handles += blocks
+
+        if columns is None:
+            blocks, columns = _share({col: arrays[col] for col in arrays if col not in other})
+            handles += blocks
+
+        shared_out = None
+        blocks_out = []
+        if outputs is not None:
+            blocks_out, shared_out = _share(outputs)
+            handles += blocks_out
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+                rows = order[start:end]
+                local = {col: arrays[col][rows] for col in other}
+                args_out = (shared_out,) if outputs is not None else ()
+                futures.append(executor.submit(fn, index, columns, *args_out, start, end, local, carry[i], *args))
+            results = [future.result() for future in futures]
+
+        # Copy results from shared memory, results in files are already written
+        blocks_out = {block.name: block for block in blocks_out}
+        for param, spec in (shared_out or {}).items():
+            if spec[0] == 'shm':
+                outputs[param][...] = np.ndarray(spec[2], dtype=spec[3], buffer=blocks_out[spec[1]].buf)
+    finally:
+        _release(handles, unlink=True)
+
+    return results
+
+
+def _evaluate_chunked(df, nodes, cols, bindings, constants, fill, outputs, chunk_samples=None, workers=None, folder=None):
+    """Calculate parameters in chunks of samples
+
+    Rows are sorted by sample and time and columns listed in fill are forward
+    filled, carrying the last value of a chunk over to the next one, as without
+    chunks. Only the columns of one chunk are copied at a time.
+    With workers, the chunks are calculated in a process pool.
+
+    :param df: DataFrame with the input columns
+    :param nodes: Parameters to calculate, dependencies first (see _plan)
+    :param cols: Columns to read (see _plan)
+    :param bindings: Column names used for inputs
+    :param constants: Constants passed to the functions (e.g. fmf0)
+    :param fill: Column names to forward fill
+    :param outputs: Parameters and arrays to write the results to (dict)
+    :param chunk_samples: Number of samples per chunk (default None, see _partitions)
+    :param workers: Number of worker processes (default None)
+    :param folder: Folder with a DataFrame saved in the npy format, read by worker processes (default None)
+    :returns: Number of chunks and samples per chunk
+    """
+
+    order, bounds, chunk_samples = _partitions(df, chunk_samples, workers)
+    carry = _carry({col: df[col].to_numpy() for col in fill if col in cols}, order, bounds, cols, fill)
+
+    if workers is not None and workers > 1:
+        _run_partitions(_evaluate_partition, df, folder, cols, order, bounds, carry, outputs, workers,
+                        nodes, cols, bindings, constants, fill)
+    else:
+        arrays = {col: df[col].to_numpy() for col in cols}
+        for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+            rows = order[start:end]
+            df_tmp = _partition_frame(arrays, rows, cols, fill, carry=carry[i])
+            values = _evaluate(df_tmp, nodes, bindings, constants)
+            for param, out in outputs.items():
+                out[rows] = values[param]
+
+    return len(bounds) - 1, chunk_samples
+
+
+def _calculate(df, source, nodes, cols, bindings, constants, fill, outputs, chunk_samples=None, workers=None, dtype=None):
+    """Calculate parameters and write them to the DataFrame
+
+    Without chunk_samples and workers, the selected columns are sorted and calculated
+    at once. Otherwise the parameters are calculated in chunks of samples, which is
+    always the case for DataFrames saved in the npy format, where each calculated
+    column is written to the folder.
+
+    :param df: DataFrame or folder with a DataFrame saved in the npy format
+    :param source: DataFrame to read the columns from (see _source)
+    :param nodes: Parameters to calculate, dependencies first (see _plan)
+    :param cols: Columns to read (see _plan)
+    :param bindings: Column names used for inputs
+    :param constants: Constants passed to the functions (e.g. fmf0)
+    :param fill: Column names to forward fill
+    :param outputs: list with column name, parameter and record of the calculation
+    :param chunk_samples: Number of samples per chunk (default None)
+    :param workers: Number of worker processes (default None)
+    :param dtype: Float type of the calculated columns (default None, float64)
+    """
+
+    dtype = float if dtype is None else dtype
+    parallel = workers is not None and workers > 1
+
+    if isinstance(df, str) and not parallel:
+        chunk_samples = chunk_samples or CHUNK_SAMPLES
+
+    if chunk_samples is None and not parallel:
+        df_tmp = _sorted_columns(source, cols, fill=fill)
+        values = _evaluate(df_tmp, nodes, bindings, constants)
+        for col, param, record in outputs:
+            _write(df, col, values[param], df_tmp.index, record, dtype)
+        return
+
+    if chunk_samples is not None and int(chunk_samples) < 1:
+        raise Exception('The number of samples per chunk needs to be a positive number.')
+
+    if isinstance(df, str):
+        files = {}
+        arrays = {}
+        for col, param, record in outputs:
+            if param not in arrays:
+                files[param], arrays[param] = _npy_create(df, len(source), dtype)
+    else:
+        arrays = {param: np.full(len(source), nan, dtype=dtype) for col, param, record in outputs}
+
+    chunks, chunk_samples = _evaluate_chunked(source, nodes, cols, bindings, constants, fill, arrays,
+                                              chunk_samples, workers, df if isinstance(df, str) else None)
+
+    if parallel:
+        print('Calculated in {0} chunk(s) of up to {1} sample(s) using {2} worker processes'.format(
+            chunks, chunk_samples, workers))
+    else:
+        print('Calculated in {0} chunk(s) of up to {1} sample(s)'.format(chunks, chunk_samples))
+
+    if isinstance(df, str):
+        for values in arrays.values():
+            values.flush()
+        _npy_add(df, [(col, files[param], record) for col, param, record in outputs])
+    else:
+        for col, param, record in outputs:
+            _write(df, col, arrays[param], df.index, record, dtype)
+
+
+def calculate(df=None, param='', *, fm='fm', f0='f0', fmp='fmp', f0p='f0p', fs='fs', fmpp='fmpp', f0pp='f0pp', fmf0=4.88, alias=None, chunk_samples=None, workers=None, dtype=None):
     """Calculate photosynthetic parameters
 
     Calculate photosynthetic parameters from basic fluorescence parameters.
+    With chunk_samples, the parameter is calculated for a number of samples at
+    a time, with the same results as at once. The DataFrame can
+    also be the folder of a DataFrame saved in the npy format, where the
+    calculated column is added to the folder. With workers, the chunks of samples
+    are calculated in a process pool.
 
     Requires the columns 'sample' and 'time'.
 
-    :param df: The DataFrame to add the calculated parameters to.
+    :param df: The DataFrame (or folder of a DataFrame saved in the npy format) to add the calculated parameters to.
     :param param: Parameter to calculate ('Fvfm','NPQ', 'NPQt','Phi2','PhiNO','PhiNPQ','qE','qEsv','qEt','qI','qIt','qL','qP')
     :param fm: fm column name (default 'fm')
     :param f0: f0 column name (default 'f0')
@@ -24,18 +640,25 @@ def calculate(df=None, param='', *, fm='fm', f0='f0', fmp='fmp', f0p='f0p', fs='
     :param f0pp: f0pp column name (default 'f0pp')
     :param fmf0: Fm/F0 for t parameter (default 4.88)
     :param alias: rename the selected parameter (default None)
+    :param chunk_samples: number of samples calculated at a time (default None)
+    :param workers: number of worker processes (default None, no parallel processing)
+    :param dtype: float type of the calculated column, float64, float32 or float16 (default None, float64)
     :returns: a dataframe column for the calculated parameter
     """
 
     # Parameter Names
-    parameters = ['Fvfm', 'NPQ', 'NPQt', 'Phi2', 'PhiNO', 'PhiNOt',
-                  'PhiNPQ', 'PhiNPQt', 'qE', 'qEsv', 'qEt', 'qI', 'qIt', 'qL', 'qP']
+    parameters = list(PARAMETERS)
 
     if df is None:
         raise Exception('No DataFrame selected.')
-    
+
+    if dtype is not None:
+        dtype = _float_dtype(dtype)
+
+    source = _source(df)
+
     for col in ['sample', 'time']:
-        if col not in df:
+        if col not in source:
             raise Exception('Column "%s" is required but not found.' % col)
 
     if (param in parameters):
@@ -45,150 +668,136 @@ def calculate(df=None, param='', *, fm='fm', f0='f0', fmp='fmp', f0p='f0p', fs='
 
         print('Calculating {0}{1}'.format(param, alias_txt))
 
-        ## Make sure only the fm and f0 values are filled, as they are the only columns
-        ## need fillna for calculations.
-        df_tmp = df.sort_values(by=['sample', 'time'], ascending=True)
-        df_tmp[[fm,f0]] = df_tmp[[fm,f0]].fillna(method="ffill")
-
-        for row in df_tmp.sort_values(by=['sample', 'time'], ascending=True).itertuples():
-            if param == 'Fvfm':
-                if {fm, f0}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = fvfm(
-                        getattr(row, fm), getattr(row, f0))
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for fm and f0')
-
-            elif param == 'NPQ':
-                if {fm, fmp}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = npq(
-                        getattr(row, fm), getattr(row, fmp))
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for fm and fmp')
-
-            elif param == 'NPQt':
-                if {fmp, f0p}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = npqt(
-                        getattr(row, fmp), getattr(row, f0p), fmf0)
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for fmp and f0p')
-
-            elif param == 'Phi2':
-                if {fmp, fs}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = phi2(
-                        getattr(row, fmp), getattr(row, fs))
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for fmp and fs')
-
-            elif param == 'PhiNO':
-                if {fmp, fs, f0p, fm, f0}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = phino(getattr(row, fmp), getattr(
-                        row, fs), getattr(row, f0p), getattr(row, fm), getattr(row, f0))
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for fmp, fs, fm, and f0')
-
-            elif param == 'PhiNOt':
-                if {fmp, fs, f0p}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = phinot(
-                        getattr(row, fmp),  getattr(row, fs), getattr(row, f0p), fmf0)
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for fmp, fs, and f0p')
-
-            elif param == 'PhiNPQ':
-                if {fmp, fs, f0p, fm, f0}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = phinpq(getattr(row, fmp), getattr(
-                        row, fs), getattr(row, f0p), getattr(row, fm), getattr(row, f0))
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for fmp, fs, f0p, fm, and f0')
-
-            elif param == 'PhiNPQt':
-                if {fmp, fs, f0p}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = phinpqt(
-                        getattr(row, fmp), getattr(row, fs), getattr(row, f0p), fmf0)
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for fmp, fs, and f0p')
-
-            elif param == 'qE':
-                if {fmpp, fmp}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = qe(
-                        getattr(row, fmpp), getattr(row, fmp))
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for fmpp and fmp')
-
-            elif param == 'qEsv':
-                if {fm, fmp, fmpp}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = qesv(
-                        getattr(row, fm), getattr(row, fmp), getattr(row, fmpp))
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for fm, fmp, and fmpp')
-
-            elif param == 'qEt':
-                if {fmp, f0p, fmpp, f0pp}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = qet(getattr(row, fmp), getattr(
-                        row, f0p), getattr(row, fmpp), getattr(row, f0pp), fmf0)
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for fmp, f0p, fmpp, and f0pp')
-
-            elif param == 'qI':
-                if {fm, fmpp}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = qi(
-                        getattr(row, fm), getattr(row, fmpp))
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for fm and fmpp')
-
-            elif param == 'qIt':
-                if {fmpp, f0pp}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = qit(
-                        getattr(row, fmpp), getattr(row, f0pp), fmf0)
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for fmpp and f0pp')
-
-            elif param == 'qL':
-                if {fmp, fs, f0p}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = ql(
-                        getattr(row, fmp), getattr(row, fs), getattr(row, f0p))
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for fmp, fs, and f0p')
-
-            elif param == 'qP':
-                if {fmp, fs, f0p}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = qp(
-                        getattr(row, fmp), getattr(row, fs), getattr(row, f0p))
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for fmp, fs, and f0p')
+        names = {'fm': fm, 'f0': f0, 'fmp': fmp, 'f0p': f0p,
+                 'fs': fs, 'fmpp': fmpp, 'f0pp': f0pp}
+        constants = {'fmf0': fmf0}
 
-            else:
-                raise Exception("No matching parameter found.")
+        nodes, cols, missing = _plan(source, [param], names)
+
+        if len(missing) > 0:
+            raise Exception(
+                'Missing parameter(s). Define columns for {0}'.format(_enumerate(missing)))
 
-        ## Write column to DataFrame
-        df[alias or param] = df_tmp[alias or param]
+        ## Make sure only the fm and f0 values are filled, as they are the only columns
+        ## need fillna for calculations. Calculate the parameter for all rows at once
+        ## and write column to DataFrame.
+        _calculate(df, source, nodes, cols, names, constants, [fm, f0],
+                   [(alias or param, param, _record(param, constants))], chunk_samples, workers, dtype)
     else:
         raise Exception('Unknown parameter. Available parameters are: {0}'.format(
             ", ".join(parameters)))
 
 
-def calculate_additional(df=None, param='', *, v_phino='PhiNOt', v_phi2='Phi2', v_ql='qL', v_par='light_intensity', phinoopt=0.2, absorptivity=0.5, fmf0=4.88, alias=None):
+def calculate_many(df=None, params=[], *, fm='fm', f0='f0', fmp='fmp', f0p='f0p', fs='fs', fmpp='fmpp', f0pp='f0pp', fmf0=4.88, alias={}, benchmark=False, chunk_samples=None, workers=None, dtype=None):
+    """Calculate multiple photosynthetic parameters
+
+    Calculate multiple photosynthetic parameters from basic fluorescence parameters
+    at once. The DataFrame is sorted and filled only once and intermediates shared
+    between parameters (e.g. qL, NPQt, Phi2) are only calculated once. The results
+    are the same as calling calculate for each parameter. See calculate for
+    chunk_samples, workers and DataFrames saved in the npy format.
+
+    Requires the columns 'sample' and 'time'.
+
+    :param df: The DataFrame (or folder of a DataFrame saved in the npy format) to add the calculated parameters to.
+    :param params: Parameters to calculate (see calculate for available parameters)
+    :param fm: fm column name (default 'fm')
+    :param f0: f0 column name (default 'f0')
+    :param fmp: fmp column name (default 'fmp')
+    :param f0p: f0p column name (default 'f0p')
+    :param fs: fs column name (default 'fs')
+    :param fmpp: fmpp column name (default 'fmpp')
+    :param f0pp: f0pp column name (default 'f0pp')
+    :param fmf0: Fm/F0 for t parameter (default 4.88)
+    :param alias: rename parameters, e.g. {'Phi2': 'YII'} (default {})
+    :param benchmark: also time calculating the parameters one at a time (default False)
+    :param chunk_samples: number of samples calculated at a time (default None)
+    :param workers: number of worker processes (default None, no parallel processing)
+    :param dtype: float type of the calculated columns, float64, float32 or float16 (default None, float64)
+    :returns: dataframe columns for the calculated parameters
+    """
+
+    # Parameter Names
+    parameters = list(PARAMETERS)
+
+    if df is None:
+        raise Exception('No DataFrame selected.')
+
+    if dtype is not None:
+        dtype = _float_dtype(dtype)
+
+    source = _source(df)
+
+    for col in ['sample', 'time']:
+        if col not in source:
+            raise Exception('Column "%s" is required but not found.' % col)
+
+    if isinstance(params, str):
+        params = [params]
+
+    params = list(dict.fromkeys(params))
+
+    if len(params) == 0:
+        raise Exception('No parameters selected.')
+
+    unknown = [param for param in params if param not in parameters]
+    if len(unknown) > 0:
+        raise Exception('Unknown parameter(s) {0}. Available parameters are: {1}'.format(
+            ", ".join(unknown), ", ".join(parameters)))
+
+    print('Calculating {0}'.format(", ".join(
+        [param if param not in alias else "{0} as {1}".format(param, alias[param]) for param in params])))
+
+    start = time.perf_counter()
+
+    names = {'fm': fm, 'f0': f0, 'fmp': fmp, 'f0p': f0p,
+             'fs': fs, 'fmpp': fmpp, 'f0pp': f0pp}
+    constants = {'fmf0': fmf0}
+
+    nodes, cols, missing = _plan(source, params, names)
+
+    if len(missing) > 0:
+        raise Exception(
+            'Missing parameter(s). Define columns for {0}'.format(_enumerate(missing)))
+
+    ## Fill once for all parameters and write columns to DataFrame
+    _calculate(df, source, nodes, cols, names, constants, [fm, f0],
+               [(alias.get(param, param), param, _record(param, constants)) for param in params], chunk_samples, workers, dtype)
+
+    elapsed = time.perf_counter() - start
+
+    ## Work saved compared to calling calculate for each parameter
+    evaluations_single = sum([len(_plan(source, [param], names)[0]) for param in params])
+
+    print('Calculated {0} parameter(s) in {1:.3f} s: {2} evaluation(s) instead of {3}.'.format(
+        len(params), elapsed, len(nodes), evaluations_single))
+
+    if benchmark:
+        df_single = source[list(dict.fromkeys(['sample', 'time'] + cols))].copy()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for param in params:
+                calculate(df_single, param, fm=fm, f0=f0, fmp=fmp, f0p=f0p,
+                          fs=fs, fmpp=fmpp, f0pp=f0pp, fmf0=fmf0, chunk_samples=chunk_samples, workers=workers, dtype=dtype)
+        elapsed_single = time.perf_counter() - start
+
+        print('Calculating one at a time took {0:.3f} s, {1:.3f} s ({2:.0%}) saved.'.format(
+            elapsed_single, elapsed_single - elapsed, 1 - (elapsed / elapsed_single) if elapsed_single > 0 else 0))
+
+
+def calculate_additional(df=None, param='', *, v_phino='PhiNOt', v_phi2='Phi2', v_ql='qL', v_par='light_intensity', phinoopt=0.2, absorptivity=0.5, fmf0=4.88, alias=None, chunk_samples=None, workers=None, dtype=None):
     """Calculate additional Parameters
 
     Calculate additional photosynthetic parameters based on calculated standard parameters.
+    Standard parameters that are not available as columns, or were calculated with
+    different constants, are calculated on demand from the fluorescence columns
+    ('fm', 'f0', 'fmp', 'f0p', 'fs'). They are only used for the calculation and
+    not added to the DataFrame. See calculate for chunk_samples, workers and
+    DataFrames saved in the npy format.
 
     Requires the columns 'sample' and 'time'.
 
-    :param df: The DataFrame to add the calculated parameters to.
+    :param df: The DataFrame (or folder of a DataFrame saved in the npy format) to add the calculated parameters to.
     :param param: Parameter to calculate ('LEF', 'Vx', 'SPhi2', 'SNPQ', 'deltaNPQ')
     :param v_phino: PhiNO column name (default 'PhiNOt')
     :param v_phi2: Phi2 column name (default 'Phi2')
@@ -197,17 +806,25 @@ def calculate_additional(df=None, param='', *, v_phino='PhiNOt', v_phi2='Phi2',
     :param absorptivity: Absorptivity for Vx parameter (default 0.5)
     :param fmf0: Fm/F0 for t parameter (default 4.88)
     :param alias: rename the selected parameter (default None)
+    :param chunk_samples: number of samples calculated at a time (default None)
+    :param workers: number of worker processes (default None, no parallel processing)
+    :param dtype: float type of the calculated column, float64, float32 or float16 (default None, float64)
     :returns: a dataframe column for the calculated parameter
     """
 
     # Parameter Names
-    parameters = ['LEF', 'Vx', 'SPhi2', 'SNPQ', 'deltaNPQ']
+    parameters = list(ADDITIONAL_PARAMETERS)
 
     if df is None:
         raise Exception('No DataFrame selected.')
-    
+
+    if dtype is not None:
+        dtype = _float_dtype(dtype)
+
+    source = _source(df)
+
     for col in ['sample', 'time']:
-        if col not in df:
+        if col not in source:
             raise Exception('Column "%s" is required but not found.' % col)
 
     if (param in parameters):
@@ -217,66 +834,261 @@ def calculate_additional(df=None, param='', *, v_phino='PhiNOt', v_phi2='Phi2',
 
         print('Calculating {0}{1}'.format(param, alias_txt))
 
-        ## No Parameter needs filling at this time
-        df_tmp = df.sort_values(by=['sample', 'time'], ascending=True)
-        # df_tmp[[fm,f0]] = df_tmp[[fm,f0]].fillna(method="ffill")
-
-        for row in df_tmp.sort_values(by=['sample', 'time'], ascending=True).itertuples():
-            if param == 'LEF':
-                if {v_phi2, v_par}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = lef(
-                        getattr(row, v_phi2), getattr(row, v_par), absorptivity)
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for v_phi2 and v_par')
-
-            elif param == 'Vx':
-                if {v_phino, v_phi2, v_par}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = vx(
-                        getattr(row, v_phino), getattr(row, v_phi2), getattr(row, v_par), absorptivity)
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for v_phino, v_phi2, and v_par')
-
-            elif param == 'SPhi2':
-                if {v_phino, v_phi2, v_ql}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = sphi2(
-                        getattr(row, v_phi2), getattr(row, v_phino), getattr(row, v_ql), phinoopt, fmf0)
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for v_phino, v_phi2, and v_ql')
-
-            elif param == 'SNPQ':
-                if {v_phino, v_phi2}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = sphinpq(
-                        getattr(row, v_phi2), getattr(row, v_phino), getattr(row, v_ql), phinoopt, fmf0)
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for v_phino, v_phi2, and v_ql')
-
-            elif param == 'deltaNPQ':
-                if {v_phino}.issubset(df_tmp.columns):
-                    df_tmp.at[row.Index, alias or param] = deltanpq(
-                        getattr(row, v_phino), phinoopt)
-                else:
-                    raise Exception(
-                        'Missing parameter(s). Define columns for fmp, fs, and f0p')
+        bindings = {'PhiNOt': v_phino, 'Phi2': v_phi2,
+                    'qL': v_ql, 'light_intensity': v_par}
+        labels = {'PhiNOt': 'v_phino', 'Phi2': 'v_phi2',
+                  'qL': 'v_ql', 'light_intensity': 'v_par'}
+        constants = {'fmf0': fmf0, 'phinoopt': phinoopt,
+                     'absorptivity': absorptivity}
 
-            else:
-                raise Exception("No matching parameter found.")
+        nodes, cols, missing = _plan(
+            source, [param], bindings, reuse=True, constants=constants)
+
+        if len(missing) > 0:
+            raise Exception('Missing parameter(s). Define columns for {0}'.format(
+                _enumerate([labels.get(name, name) for name in missing])))
 
-        ## Write column to DataFrame
-        df[alias or param] = df_tmp[alias or param]
+        if len(nodes) > 1:
+            print('Calculating {0} on demand'.format(_enumerate(nodes[:-1])))
+
+        ## Only fm and f0 need filling, in case standard parameters are calculated
+        _calculate(df, source, nodes, cols, bindings, constants, ['fm', 'f0'],
+                   [(alias or param, param, _record(param, constants))], chunk_samples, workers, dtype)
     else:
         raise Exception('Unknown parameter. Available parameters are: {0}'.format(
             ", ".join(parameters)))
 
 
-def calculate_custom(df=None, name='', fn=None, *, cols=[], fill=[], params={}):
+def sweep(df=None, params=[], *, fmf0=4.88, phinoopt=0.2, absorptivity=0.5, fm='fm', f0='f0', fmp='fmp', f0p='f0p', fs='fs', fmpp='fmpp', f0pp='f0pp', v_par='light_intensity'):
+    """Calculate parameters for a grid of constants
+
+    Calculate basic and additional parameters for every combination of the values
+    given for fmf0, phinoopt and absorptivity in a single pass. Each constant is
+    an axis the calculation is broadcast over, so every parameter is calculated once
+    for each combination of the constants it depends on. The values are the same as
+    calculating each combination with calculate or calculate_additional. The
+    DataFrame is not changed.
+
+    Requires the columns 'sample' and 'time'.
+
+    :param df: DataFrame
+    :param params: Parameters to calculate (see calculate and calculate_additional)
+    :param fmf0: Fm/F0 for t parameters, a value or a list of values (default 4.88)
+    :param phinoopt: Optimal PhiNO, a value or a list of values (default 0.2)
+    :param absorptivity: Absorptivity, a value or a list of values (default 0.5)
+    :param fm: fm column name (default 'fm')
+    :param f0: f0 column name (default 'f0')
+    :param fmp: fmp column name (default 'fmp')
+    :param f0p: f0p column name (default 'f0p')
+    :param fs: fs column name (default 'fs')
+    :param fmpp: fmpp column name (default 'fmpp')
+    :param f0pp: f0pp column name (default 'f0pp')
+    :param v_par: light intensity column name (default 'light_intensity')
+    :returns: DataFrame with the index of df and a column for each parameter and combination of constants (column levels 'param' and the constants used, NaN for constants a parameter doesn't depend on)
+    """
+
+    # Parameter Names
+    parameters = list(_GRAPH)
+
+    if df is None:
+        raise Exception('No DataFrame selected.')
+
+    for col in ['sample', 'time']:
+        if col not in df:
+            raise Exception('Column "%s" is required but not found.' % col)
+
+    if isinstance(params, str):
+        params = [params]
+
+    params = list(dict.fromkeys(params))
+
+    if len(params) == 0:
+        raise Exception('No parameters selected.')
+
+    unknown = [param for param in params if param not in parameters]
+    if len(unknown) > 0:
+        raise Exception('Unknown parameter(s) {0}. Available parameters are: {1}'.format(
+            ", ".join(unknown), ", ".join(parameters)))
+
+    grid = {}
+    for name, values in [('fmf0', fmf0), ('phinoopt', phinoopt), ('absorptivity', absorptivity)]:
+        grid[name] = np.atleast_1d(np.asarray(values, dtype=float)).ravel()
+        if len(grid[name]) == 0:
+            raise Exception('No values defined for {0}.'.format(name))
+
+    # Only constants used by the selected parameters
+    used = [name for name in grid if any([name in _constants(param) for param in params])]
+
+    # One axis for each constant, the rows are the last axis
+    constants = {}
+    for axis, name in enumerate(grid):
+        shape = [1] * (len(grid) + 1)
+        shape[axis] = len(grid[name])
+        constants[name] = grid[name].reshape(shape)
+
+    names = {'fm': fm, 'f0': f0, 'fmp': fmp, 'f0p': f0p, 'fs': fs,
+             'fmpp': fmpp, 'f0pp': f0pp, 'light_intensity': v_par}
+
+    nodes, cols, missing = _plan(df, params, names)
+
+    if len(missing) > 0:
+        raise Exception(
+            'Missing parameter(s). Define columns for {0}'.format(_enumerate(missing)))
+
+    combinations = int(np.prod([len(grid[name]) for name in used]))
+    print('Calculating {0} for {1} combination(s) of {2}'.format(
+        ", ".join(params), combinations, _enumerate(used) if len(used) > 0 else "constants"))
+
+    ## Sort and fill once, like calculate
+    df_tmp = _sorted_columns(df, cols, fill=[fm, f0])
+    values = _evaluate(df_tmp, nodes, names, constants)
+
+    ## Column for each parameter and combination of the constants it depends on
+    columns = []
+    for param in params:
+        shape = np.shape(values[param])
+        for position in np.ndindex(shape[:-1] if len(shape) > 1 else ()):
+            columns.append((param, position, tuple([param] + [
+                grid[name][position[i]] if (name in _constants(param)) else nan
+                for i, name in enumerate(grid) if name in used])))
+
+    ## Results in the order of the DataFrame, as a single block
+    order = _sort_order(df)
+    table = np.empty((len(df), len(columns)), order='F')
+    for j, (param, position, label) in enumerate(columns):
+        table[order, j] = values[param][position]
+
+    return pd.DataFrame(table, index=df.index, copy=False, columns=pd.MultiIndex.from_tuples(
+        [label for param, position, label in columns], names=['param'] + used))
+
+
+def check_dtype(df=None, dtype='float32', params=[], *, rtol=1e-3, atol=1e-6, fmf0=4.88, phinoopt=0.2, absorptivity=0.5, fm='fm', f0='f0', fmp='fmp', f0p='f0p', fs='fs', fmpp='fmpp', f0pp='f0pp', v_par='light_intensity'):
+    """Check parameters calculated with a smaller float type
+
+    Calculate parameters once from the fluorescence columns as float64 and once
+    from the fluorescence columns stored as dtype, with the results stored as dtype
+    as well, and compare them. The light intensity is kept as float64, like it is
+    when importing. Use it to decide if a DataFrame can be imported and calculated
+    with dtype. The DataFrame is not changed.
+
+    Requires the columns 'sample' and 'time'.
+
+    :param df: DataFrame
+    :param dtype: Float type to check, float32 or float16 (default 'float32')
+    :param params: Parameters to check (default: all parameters that can be calculated)
+    :param rtol: Relative tolerance (default 1e-3)
+    :param atol: Absolute tolerance (default 1e-6)
+    :param fmf0: Fm/F0 for t parameters (default 4.88)
+    :param phinoopt: Optimal PhiNO (default 0.2)
+    :param absorptivity: Absorptivity (default 0.5)
+    :param fm: fm column name (default 'fm')
+    :param f0: f0 column name (default 'f0')
+    :param fmp: fmp column name (default 'fmp')
+    :param f0p: f0p column name (default 'f0p')
+    :param fs: fs column name (default 'fs')
+    :param fmpp: fmpp column name (default 'fmpp')
+    :param f0pp: f0pp column name (default 'f0pp')
+    :param v_par: light intensity column name (default 'light_intensity')
+    :returns: DataFrame with a row for each parameter and the maximum absolute and relative error, the fraction of values outside the tolerance and if all values are within the tolerance
+    """
+
+    # Parameter Names
+    parameters = list(_GRAPH)
+
+    if df is None:
+        raise Exception('No DataFrame selected.')
+
+    dtype = _float_dtype(dtype)
+
+    for col in ['sample', 'time']:
+        if col not in df:
+            raise Exception('Column "%s" is required but not found.' % col)
+
+    names = {'fm': fm, 'f0': f0, 'fmp': fmp, 'f0p': f0p, 'fs': fs,
+             'fmpp': fmpp, 'f0pp': f0pp, 'light_intensity': v_par}
+
+    if isinstance(params, str):
+        params = [params]
+
+    params = list(dict.fromkeys(params))
+
+    # All parameters the columns are available for
+    if len(params) == 0:
+        params = [param for param in parameters if len(_plan(df, [param], names)[2]) == 0]
+        if len(params) == 0:
+            raise Exception('No parameters can be calculated from the DataFrame.')
+
+    unknown = [param for param in params if param not in parameters]
+    if len(unknown) > 0:
+        raise Exception('Unknown parameter(s) {0}. Available parameters are: {1}'.format(
+            ", ".join(unknown), ", ".join(parameters)))
+
+    nodes, cols, missing = _plan(df, params, names)
+
+    if len(missing) > 0:
+        raise Exception(
+            'Missing parameter(s). Define columns for {0}'.format(_enumerate(missing)))
+
+    constants = {'fmf0': fmf0, 'phinoopt': phinoopt, 'absorptivity': absorptivity}
+
+    ## Sort and fill once, like calculate
+    df_tmp = _sorted_columns(df, cols, fill=[fm, f0])
+    reference = _evaluate(df_tmp, nodes, names, constants)
+
+    ## Fluorescence columns stored as dtype
+    for col in cols:
+        if col != v_par and df_tmp[col].dtype.kind == 'f':
+            with np.errstate(over='ignore'):
+                df_tmp[col] = df_tmp[col].astype(dtype)
+    values = _evaluate(df_tmp, nodes, names, constants)
+
+    results = []
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for param in params:
+            expected = np.asarray(reference[param], dtype=float)
+            actual = np.asarray(values[param]).astype(dtype).astype(float)
+
+            error = np.abs(actual - expected)
+            finite = np.isfinite(error)
+            relative = error[finite & (expected != 0)] / np.abs(expected[finite & (expected != 0)])
+            close = np.isclose(actual, expected, rtol=rtol, atol=atol, equal_nan=True)
+
+            results.append([
+                error[finite].max() if finite.any() else nan,
+                relative.max() if len(relative) > 0 else nan,
+                1 - close.mean() if len(close) > 0 else 0.0,
+                bool(close.all())
+            ])
+
+    result = pd.DataFrame(results, index=pd.Index(params, name='param'),
+                          columns=['max_abs_error', 'max_rel_error', 'outside', 'within'])
+
+    print('{0} of {1} parameter(s) within tolerance as {2} (rtol={3}, atol={4})'.format(
+        int(result['within'].sum()), len(result), dtype.name, rtol, atol))
+    outside = result.index[~result['within']].tolist()
+    if len(outside) > 0:
+        print('Outside tolerance: {0}'.format(", ".join(outside)))
+
+    return result
+
+
+def calculate_custom(df=None, name='', fn=None, *, cols=[], fill=[], params={}, vectorized=False, chunksize=None, workers=None):
     """Calculate additional Parameters
 
     Use a custom function to calculate a custom parameter.
 
+    By default the function is called once for every row with single values. With
+    vectorized, the function is called with whole columns (numpy arrays) instead and
+    needs to return an array of the same length (or a single value). Use 'auto' to
+    try calling the function with arrays first and fall back to single values if
+    that fails. With chunksize, arrays of at most chunksize rows are passed at a
+    time, for functions that only accept arrays of limited size. The column has the
+    same type either way, integers are stored as floats and booleans as objects.
+
+    With workers, the samples are split into partitions that are calculated in a
+    process pool, with the same results as without workers. The function needs to
+    be importable by the worker processes (e.g. not a lambda).
+
     Requires the columns 'sample' and 'time'.
 
     :param df: The DataFrame to add the calculated parameters to.
@@ -285,6 +1097,9 @@ def calculate_custom(df=None, name='', fn=None, *, cols=[], fill=[], params={}):
     :param cols: Column names for parameters passed to function. (*args)
     :param fill: Column names for parameters to be filled using fillna with ffill. (*args)
     :param params: Parameters passed on to the function (**kwargs)
+    :param vectorized: pass whole columns to the function, True, False or 'auto' (default False)
+    :param chunksize: maximum number of rows passed to a vectorized function at once (default None)
+    :param workers: number of worker processes (default None, no parallel processing)
     :returns: a dataframe column for the custom calculated parameter
     """
 
@@ -301,17 +1116,125 @@ def calculate_custom(df=None, name='', fn=None, *, cols=[], fill=[], params={}):
         if col not in df:
             raise Exception('Column "%s" is required but not found.' % col)
 
+    if vectorized not in [True, False, 'auto']:
+        raise Exception('Vectorized needs to be True, False or "auto".')
+
+    if (chunksize is not None) and (vectorized is False):
+        raise Exception('A chunksize requires vectorized to be True or "auto".')
+
+    if (chunksize is not None) and (int(chunksize) < 1):
+        raise Exception('The chunksize needs to be a positive number.')
+
+    missing = [col for col in list(cols) + list(fill) if col not in df]
+    if len(missing) > 0:
+        raise Exception('Column(s) {0} not found.'.format(", ".join(missing)))
+
     if hasattr(fn, '__call__'):
-        df_tmp = df.sort_values(by=['sample', 'time'], ascending=True)
         if len(fill) > 0:
             print('Column(s) {0} filled.'.format(",".join(fill)))
-            # df = df.sort_values(by=['sample', 'time'], ascending=True)
-            # df[['fm']] = df[['fm']].fillna(method="ffill")
-            df_tmp = df.sort_values(by=['sample', 'time'], ascending=True)
-            df_tmp[fill] = df_tmp[fill].fillna(method="ffill")
-        for row in df_tmp.sort_values(by=['sample', 'time'], ascending=True).itertuples():
-            df_tmp.at[row.Index, name] = fn(
-                *[getattr(row, n) for n in cols], **params)
-        df[name] = df_tmp[name]
+
+        if workers is not None and workers > 1:
+            order, bounds, chunk_samples = _partitions(df, None, workers)
+            carry = _carry({col: df[col].to_numpy() for col in fill if col in cols}, order, bounds, cols, fill)
+            results = _run_partitions(_custom_partition, df, None, cols, order, bounds, carry, None, workers,
+                                      fn, cols, fill, params, vectorized, chunksize)
+            print('Calculated in {0} chunk(s) of up to {1} sample(s) using {2} worker processes'.format(
+                len(results), chunk_samples, workers))
+
+            fallback = any([part[1] for part in results])
+            if all([isinstance(part[0], np.ndarray) for part in results]):
+                result = np.concatenate([part[0] for part in results])
+            else:
+                result = [value for part in results for value in part[0]]
+            index = df.index[order]
+        else:
+            df_tmp = _sorted_columns(df, cols, fill=fill)
+            result, fallback = _custom_values(df_tmp, len(df_tmp), fn, cols, params, vectorized, chunksize)
+            index = df_tmp.index
+
+        if fallback:
+            print('Function does not accept arrays, calculating row by row.')
+
+        ## Same column types as writing the values one by one
+        result = pd.Series(result, index=index)
+        if pd.api.types.is_integer_dtype(result.dtype):
+            result = result.astype(float)
+        elif pd.api.types.is_bool_dtype(result.dtype):
+            result = result.astype(object)
+
+        ## A custom column replaces a calculated parameter of the same name
+        _write(df, name, result, index, dtype=None)
     else:
         raise Exception('No function defined.')
+
+
+def _custom_values(df_tmp, size, fn, cols, params, vectorized=False, chunksize=None):
+    """Call a custom function with the columns of a DataFrame
+
+    See calculate_custom for the options.
+
+    :param df_tmp: DataFrame with the columns
+    :param size: Number of rows
+    :param fn: Function
+    :param cols: Column names passed to the function (*args)
+    :param params: Parameters passed on to the function (**kwargs)
+    :param vectorized: pass whole columns to the function, True, False or 'auto' (default False)
+    :param chunksize: maximum number of rows passed to a vectorized function at once (default None)
+    :returns: calculated values and whether the function fell back to single values
+    """
+
+    if vectorized:
+        result = None
+        try:
+            result = _call_vectorized(
+                fn, [df_tmp[col].to_numpy() for col in cols], params, size, chunksize, strict=(vectorized is True))
+        except Exception:
+            if vectorized is True:
+                raise
+        if result is not None:
+            return result, False
+
+    if len(cols) > 0:
+        rows = zip(*[df_tmp[col].tolist() for col in cols])
+    else:
+        rows = [()] * size
+
+    return [fn(*row, **params) for row in rows], bool(vectorized)
+
+
+def _call_vectorized(fn, arrays, params, size, chunksize=None, strict=True):
+    """Call a function with whole columns
+
+    :param fn: Function
+    :param arrays: Column arrays passed to the function (*args)
+    :param params: Parameters passed on to the function (**kwargs)
+    :param size: Number of rows
+    :param chunksize: Maximum number of rows passed at once (default None)
+    :param strict: Accept a single value returned for columns (default True)
+    :returns: calculated values (array) or None if the result doesn't match the rows
+    """
+
+    if (chunksize is None) or (size <= int(chunksize)):
+        chunks = [(0, size)]
+    else:
+        chunks = [(start, min(start + int(chunksize), size))
+                  for start in range(0, size, int(chunksize))]
+
+    results = []
+    for start, end in chunks:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = np.asarray(
+                fn(*[arr[start:end] for arr in arrays], **params))
+
+        if result.ndim == 0 and (strict or len(arrays) == 0):
+            result = np.full(end - start, result[()])
+
+        if result.shape != (end - start,):
+            if strict:
+                raise Exception('Function returned {0} value(s) for {1} row(s).'.format(
+                    result.size, end - start))
+            return None
+
+        results.append(result)
+
+    return np.concatenate(results)
@@ -2,19 +2,703 @@
 Creates accessible dataframes from DEPI data files saved by Visual Phenomics.
 """
 
+from concurrent.futures import ProcessPoolExecutor
 import csv
-from numpy import nan, isnan, ceil
+from functools import lru_cache
+import hashlib
+import json
+import numpy as np
+from numpy import nan, isnan
 import os
 import pandas as pd
 import re
 
+# Possible sample header column names
+SAMPLE_HEADER = 'name[position][flat][experiment][camera][replicate]'
+SAMPLE_HEADER_OLD = 'name[flat][experiment][camera][replicate]'
 
-def dataframe(path=None, prefix=None):
+# Format version of the npz bundles
+BUNDLE_VERSION = 1
+
+# Import cache folder and format version
+CACHE_FOLDER = '.vppy_cache'
+CACHE_VERSION = 1
+
+# File names for the formats to save DataFrames
+SAVE_FORMATS = {
+    'pickle': 'dataframe.pkl',
+    'parquet': 'dataframe.parquet',
+    'feather': 'dataframe.feather',
+    'npy': 'dataframe'
+}
+
+# Format version of the npy folders
+NPY_VERSION = 1
+
+# DataFrame attribute with the row order sorted by sample and time
+SORT_ORDER = '_vppy_sort_order'
+
+# Float types available for the parameter columns
+FLOAT_DTYPES = ['float64', 'float32', 'float16']
+
+
+def _to_float(values):
+    """Convert strings to floats
+
+    Values that cannot be converted are returned as NaN.
+
+    :param values: Array with strings
+    :returns: Array with floats
+    """
+
+    try:
+        return values.astype(float)
+    except (TypeError, ValueError):
+        pass
+
+    # Convert each unique string only once
+    codes, uniques = pd.factorize(values.ravel())
+    converted = np.full(len(uniques) + 1, nan)
+    for i, value in enumerate(uniques):
+        try:
+            converted[i] = float(value)
+        except (TypeError, ValueError):
+            pass
+    return converted[codes].reshape(values.shape)
+
+
+def _float_dtype(dtype):
+    """Float type for parameter columns
+
+    :param dtype: Type name (float64, float32 or float16) or numpy type
+    :returns: numpy dtype
+    :raises Exception: if the type is not available
+    """
+
+    try:
+        available = dtype is not None and np.dtype(dtype).name in FLOAT_DTYPES
+    except TypeError:
+        available = False
+
+    if not available:
+        raise Exception('Type "{0}" not available, use {1}.'.format(dtype, ', '.join(FLOAT_DTYPES)))
+
+    return np.dtype(dtype)
+
+
+def _skip_samples(samples):
+    """Samples to skip
+
+    :param samples: Array with samples
+    :returns: Array, True for samples to skip
+    """
+
+    # if the sample name is empty or null, skip the row
+    return np.array([(sample == '') or (sample[0] == '[') or sample.startswith('null')
+                     for sample in samples], dtype=bool)
+
+
+def _read_file(filepath, start=0):
+    """Read a parameter file
+
+    Read a tab separated parameter file with a sample per row and a timepoint
+    per column in bulk.
+
+    :param filepath: Path to the parameter file
+    :param start: Number of timepoints to skip, to only read new timepoints (default: 0)
+    :returns: dict with the samples, timepoints (header strings), values and light intensities
+    """
+
+    with open(filepath, mode='r') as file:
+        fieldnames = next(csv.reader(file, delimiter='\t'))
+
+    # New Header format
+    if SAMPLE_HEADER in fieldnames:
+        header = SAMPLE_HEADER
+
+    # Old sample header format
+    elif SAMPLE_HEADER_OLD in fieldnames:
+        header = SAMPLE_HEADER_OLD
+
+    # Not matching the standard header format, use first column
+    else:
+        header = fieldnames[0]
+
+    sample_col = fieldnames.index(header)
+    value_cols = [i for i in range(len(fieldnames)) if i != sample_col][start:]
+
+    # Read values as floats, in case of values that can't be parsed as numbers
+    # read everything as strings and convert them afterwards.
+    try:
+        table = pd.read_csv(filepath, sep='\t', header=None, skiprows=1, names=range(len(fieldnames)),
+                            usecols=[sample_col] + value_cols, converters={sample_col: str},
+                            dtype={i: float for i in value_cols}, float_precision='round_trip')
+        values = table[value_cols].to_numpy(dtype=float)
+    except ValueError:
+        table = pd.read_csv(filepath, sep='\t', header=None, skiprows=1, names=range(len(fieldnames)),
+                            usecols=[sample_col] + value_cols, dtype=str, na_filter=False)
+        values = _to_float(table[value_cols].to_numpy(dtype=object))
+
+    samples = table[sample_col].to_numpy(dtype=object)
+
+    # Light intensities
+    light = samples == '*light_intensity'
+
+    keep = ~(_skip_samples(samples) | light)
+
+    return {
+        'annotated': header in [SAMPLE_HEADER, SAMPLE_HEADER_OLD],
+        'samples': samples[keep],
+        'keys': [fieldnames[i] for i in value_cols],
+        'values': values[keep],
+        'light': values[light]
+    }
+
+
+def _cache_dir(path, cache):
+    """Get the import cache directory for a folder
+
+    :param path: the path to the directory with parameter text files
+    :param cache: True to keep the cache in the folder, or a directory for all caches
+    :returns: path to the cache directory
+    """
+
+    if cache is True:
+        return os.path.join(path, CACHE_FOLDER)
+
+    # One directory per imported folder
+    return os.path.join(cache, hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest())
+
+
+def _load_manifest(cache_dir):
+    """Load the manifest of an import cache
+
+    :param cache_dir: path to the cache directory
+    :returns: dict with mtime, size and hash for each cached file
+    """
+
+    try:
+        with open(os.path.join(cache_dir, 'manifest.json'), mode='r') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+    if manifest.get('version') != CACHE_VERSION:
+        return {}
+
+    return manifest.get('files', {})
+
+
+def _save_manifest(cache_dir, files):
+    """Save the manifest of an import cache
+
+    :param cache_dir: path to the cache directory
+    :param files: dict with mtime, size and hash for each cached file
+    """
+
+    filepath = os.path.join(cache_dir, 'manifest.json')
+    with open(filepath + '.tmp', mode='w') as file:
+        json.dump({'version': CACHE_VERSION, 'files': files}, file, indent=2)
+    os.replace(filepath + '.tmp', filepath)
+
+
+def _load_sidecar(filepath):
+    """Load a parsed parameter file from the import cache
+
+    :param filepath: Path to the sidecar file
+    :returns: dict like the one returned by _read_file
+    """
+
+    with np.load(filepath, allow_pickle=False) as sidecar:
+        return {
+            'annotated': bool(sidecar['annotated']),
+            'samples': sidecar['samples'].astype(object),
+            'keys': sidecar['keys'].tolist(),
+            'values': sidecar['values'],
+            'light': sidecar['light'],
+            'lengths': sidecar['lengths'],
+            'digest': str(sidecar['digest'])
+        }
+
+
+def _save_sidecar(filepath, data):
+    """Save a parsed parameter file to the import cache
+
+    :param filepath: Path to the sidecar file
+    :param data: dict returned by _read_file, with line lengths and digest
+    """
+
+    temp = '{0}.{1}.tmp'.format(filepath, os.getpid())
+    with open(temp, mode='wb') as file:
+        np.savez(file,
+                 annotated=np.array(data['annotated']),
+                 samples=np.array(data['samples'], dtype=str),
+                 keys=np.array(data['keys'], dtype=str),
+                 values=data['values'],
+                 light=data['light'],
+                 lengths=data['lengths'],
+                 digest=np.array(data['digest']))
+    os.replace(temp, filepath)
+
+
+def _lines_digest(lines, lengths=None):
+    """Hash the lines of a file
+
+    :param lines: list with lines (bytes)
+    :param lengths: only hash the beginning of each line (default: None)
+    :returns: hex digest
+    """
+
+    digest = hashlib.sha1()
+    for i, line in enumerate(lines):
+        digest.update(line if lengths is None else line[:lengths[i]])
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def _is_appended(lines, cached):
+    """Check if timepoints were only appended to a file
+
+    Each line of the file needs to start with the line previously
+    cached, followed by new tab separated values.
+
+    :param lines: list with lines (bytes)
+    :param cached: dict returned by _load_sidecar
+    :returns: True if only timepoints were appended
+    """
+
+    lengths = cached['lengths']
+    if len(lines) != len(lengths):
+        return False
+
+    for line, length in zip(lines, lengths):
+        if len(line) != length and line[length:length+1] != b'\t':
+            return False
+
+    return _lines_digest(lines, lengths) == cached['digest']
+
+
+def _read_cached(filepath, sidecar, entry=None):
+    """Read a parameter file using the import cache
+
+    Unchanged files are loaded from the cache. If timepoints were appended
+    to a file, only the new timepoints are parsed and appended to the cached
+    data. Otherwise the file is parsed and the cache is updated.
+
+    :param filepath: Path to the parameter file
+    :param sidecar: Path to the sidecar file in the cache
+    :param entry: Manifest entry for the file (default: None)
+    :returns: dict like the one returned by _read_file, manifest entry and status
+    """
+
+    stat = os.stat(filepath)
+    cached = None
+
+    if entry is not None and os.path.exists(sidecar):
+        if entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            return _load_sidecar(sidecar), entry, 'unchanged'
+        cached = _load_sidecar(sidecar)
+
+    with open(filepath, mode='rb') as file:
+        content = file.read()
+
+    previous = entry
+    entry = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'sha1': hashlib.sha1(content).hexdigest()}
+
+    # Only the modification time changed
+    if cached is not None and previous['sha1'] == entry['sha1']:
+        return cached, entry, 'unchanged'
+
+    lines = [line.rstrip(b'\r') for line in content.split(b'\n')]
+
+    if cached is not None and _is_appended(lines, cached):
+        data = _read_file(filepath, start=len(cached['keys']))
+        data['keys'] = cached['keys'] + data['keys']
+        data['values'] = np.hstack([cached['values'], data['values']])
+        data['light'] = np.hstack([cached['light'], data['light']])
+        status = 'appended'
+    else:
+        data = _read_file(filepath)
+        status = 'parsed'
+
+    data['lengths'] = np.array([len(line) for line in lines], dtype=np.int64)
+    data['digest'] = _lines_digest(lines)
+    _save_sidecar(sidecar, data)
+
+    return data, entry, status
+
+
+@lru_cache(maxsize=65536)
+def _sample_meta(sample):
+    """Get name and annotations from a sample
+
+    The results are cached, so each sample is only parsed once, even when
+    it is found in multiple files or folders.
+
+    :param sample: sample string (name[position][flat][experiment][camera][replicate])
+    :returns: name, position, flat, experiment, camera and replicate (tuple)
+    """
+
+    meta = re.findall(r"\[(.*?)\]", sample)
+
+    # Some samples seem to miss the position
+    if len(meta) == 4:
+        meta.insert(0, "n/a")
+    if meta[0] == '':
+        meta[0] = "n/a"
+
+    return (sample.split('[')[0], meta[0], meta[1], meta[2], meta[3], meta[4])
+
+
+def _parameter_files(path, prefix=None):
+    """List the parameter files in a folder
+
+    :param path: the path to the directory with parameter text files
+    :param prefix: prefix to remove from the file names (default: '^all')
+    :returns: list with parameter name and file name for each file
+    """
+
+    if prefix is None:
+        prefix = r'^all'
+    else:
+        prefix = r'{0}'.format(prefix)
+
+    files = []
+    for f in os.listdir(path):
+
+        file_name = re.sub(prefix, '', os.path.splitext(f)[0], 1)
+        file_ext = os.path.splitext(f)[1]
+        if file_ext != '.txt':
+            continue
+
+        files.append((file_name, f))
+
+    return files
+
+
+def _read_bundle(filepath, index):
+    """Read a parameter from a bundle
+
+    :param filepath: Path to the bundle created by to_npz
+    :param index: Index of the parameter in the bundle
+    :returns: dict like the one returned by _read_file
+    """
+
+    with np.load(filepath, allow_pickle=False) as bundle:
+        time_idx = bundle['times_{0}'.format(index)]
+        values = bundle['values_{0}'.format(index)]
+
+        # Values saved as text are converted like values read from text files
+        if values.dtype.kind != 'f':
+            values = _to_float(values.astype(object))
+
+        samples = bundle['labels'][bundle['samples_{0}'.format(index)]].astype(object)
+        keep = ~_skip_samples(samples)
+
+        return {
+            'annotated': True,
+            'samples': samples[keep],
+            'keys': bundle['times'][time_idx].tolist(),
+            'values': values.astype(float)[keep],
+            'light': bundle['light'][time_idx].reshape(1, -1)
+        }
+
+
+def _bundle_files(filepath):
+    """List the parameters in a bundle
+
+    :param filepath: Path to the bundle created by to_npz
+    :returns: list with parameter name and file name for each parameter
+    """
+
+    try:
+        with np.load(filepath, allow_pickle=False) as bundle:
+            if int(bundle['version']) != BUNDLE_VERSION:
+                raise Exception('File "{0}" is not a supported bundle.'.format(filepath))
+            return [(name, 'all{0}.txt'.format(name)) for name in bundle['parameters'].tolist()]
+    except (OSError, ValueError, KeyError):
+        raise Exception('File "{0}" is not a supported bundle.'.format(filepath))
+
+
+def _read_tasks(path, prefix=None, cache=None):
+    """Get the functions reading the parameter files of a folder
+
+    :param path: the path to the directory with parameter text files
+    :param prefix: prefix to remove from the file names (default: '^all')
+    :param cache: Use the import cache, see dataframe (default: None)
+    :returns: list with parameter name, file name, function and arguments for each file
+    """
+
+    # Bundles are read directly, without cache
+    if os.path.isfile(path):
+        return [(file_name, f, _read_bundle, (path, i)) for i, (file_name, f) in enumerate(_bundle_files(path))]
+
+    files = _parameter_files(path, prefix)
+
+    if not cache:
+        return [(file_name, f, _read_file, (os.path.join(path, f),)) for file_name, f in files]
+
+    cache_dir = _cache_dir(path, cache)
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+
+    manifest = _load_manifest(cache_dir)
+
+    return [(file_name, f, _read_cached, (os.path.join(path, f), os.path.join(cache_dir, f + '.npz'), manifest.get(f)))
+            for file_name, f in files]
+
+
+def _update_cache(cache_dir, files, results):
+    """Update the manifest of an import cache
+
+    Sidecar files for parameter files that no longer exist are removed.
+
+    :param cache_dir: path to the cache directory
+    :param files: list with file names
+    :param results: list with the results of _read_cached for each file
+    :returns: list with parsed files
+    """
+
+    _save_manifest(cache_dir, {f: entry for f, (data, entry, status) in zip(files, results)})
+
+    for sidecar in os.listdir(cache_dir):
+        if sidecar.endswith('.npz') and sidecar[:-4] not in files:
+            os.remove(os.path.join(cache_dir, sidecar))
+
+    status = [status for data, entry, status in results]
+    print('Import cache "{0}": {1} file(s) unchanged, {2} appended, {3} parsed'.format(
+        cache_dir, status.count('unchanged'), status.count('appended'), status.count('parsed')))
+
+    return [data for data, entry, status in results]
+
+
+def _merge_files(files, dtype=float):
+    """Merge parameter files from a folder
+
+    Parsed parameter files are turned into long form and merged on
+    sample and time.
+
+    :param files: list with parameter name, file name and parsed file
+    :param dtype: Float type of the parameter columns (default: float)
+    :returns: DataFrame
+    """
+
+    dfheader = ['sample', 'name', 'time', 'light_intensity']
+    dflightint = {}
+    parsed = []
+
+    for file_name, f, data in files:
+
+        if not data['annotated']:
+            print('File "{0}" does not support the standard annotation format, falling back to simple import.'.format(f))
+
+        # add column header
+        dfheader.append(file_name)
+
+        # Light intensities, the first valid value for each time is used
+        for row in data['light']:
+            for key, value in zip(data['keys'], row):
+                if key not in dflightint:
+                    dflightint[key] = value
+                elif isnan(dflightint[key]) & ~isnan(value):
+                    dflightint[key] = value
+
+        parsed.append((file_name, data))
+
+    # Unique samples and time keys over all files
+    sample_codes, samples = pd.factorize(np.concatenate(
+        [data['samples'] for file_name, data in parsed] + [np.array([], dtype=object)]))
+    key_codes, keys = pd.factorize(np.concatenate(
+        [np.array(data['keys'], dtype=object) for file_name, data in parsed] + [np.array([], dtype=object)]))
+
+    # Long form (sample, time key) for every file, row by row
+    sample_list = []
+    key_list = []
+    file_list = []
+    sample_start = 0
+    key_start = 0
+    for i, (file_name, data) in enumerate(parsed):
+        n_samples = len(data['samples'])
+        n_keys = len(data['keys'])
+        sample_list.append(np.repeat(sample_codes[sample_start:sample_start+n_samples], n_keys))
+        key_list.append(np.tile(key_codes[key_start:key_start+n_keys], n_samples))
+        file_list.append(np.full(n_samples * n_keys, i))
+        sample_start += n_samples
+        key_start += n_keys
+
+    sample_codes = np.concatenate(sample_list + [np.array([], dtype=np.int64)])
+    key_codes = np.concatenate(key_list + [np.array([], dtype=np.int64)])
+
+    # Rows for unique sample and time, in order of appearance
+    row_codes, rows = pd.factorize(sample_codes.astype(np.int64) * len(keys) + key_codes)
+    first = np.unique(row_codes, return_index=True)[1]
+
+    row_samples = sample_codes[first]
+    row_keys = key_codes[first]
+    row_files = np.concatenate(file_list + [np.array([], dtype=np.int64)])[first]
+
+    columns = {
+        'time': np.array([float(key) for key in keys], dtype=float)[row_keys],
+        'light_intensity': np.array([dflightint.get(str(float(key)), nan) for key in keys], dtype=float)[row_keys],
+    }
+
+    # Values for each parameter file
+    start = 0
+    for file_name, data in parsed:
+        size = data['values'].size
+        values = np.full(len(rows), nan, dtype=dtype)
+        with np.errstate(over='ignore'):
+            values[row_codes[start:start+size]] = data['values'].ravel()
+        if np.isinf(values).sum() > np.isinf(data['values']).sum():
+            print('Values in "{0}" exceed the range of {1} and are stored as inf.'.format(file_name, np.dtype(dtype).name))
+        columns[file_name] = values
+        start += size
+
+    # Sample name and annotations, if the file creating the row is annotated
+    annotated = np.array([data['annotated'] for file_name, data in parsed], dtype=bool)[row_files]
+
+    # Table with the sample information for each unique sample (and annotation),
+    # the categorical columns are built from the table codes instead of strings
+    row_table, table = pd.factorize(row_samples.astype(np.int64) * 2 + annotated)
+    table_samples = samples[table // 2]
+    table = pd.DataFrame(
+        [_sample_meta(sample) if is_annotated else (sample, nan, nan, nan, nan, nan)
+         for sample, is_annotated in zip(table_samples, table % 2 == 1)],
+        columns=['name', 'position', 'flat', 'experiment', 'camera', 'replicate'],
+        dtype=object
+    )
+    table['sample'] = table_samples
+
+    for col in table:
+        categories = pd.Categorical(table[col])
+        columns[col] = pd.Categorical.from_codes(
+            categories.codes[row_table], categories.categories).remove_unused_categories()
+
+    dfheader += ['position', 'flat',
+                 'experiment', 'camera', 'replicate']
+
+    return pd.DataFrame({col: columns[col] for col in dict.fromkeys(dfheader)}, columns=dfheader)
+
+
+def _prepare_folder(df, path=None):
+    """Prepare the DataFrame imported from a folder
+
+    :param df: DataFrame from a folder
+    :param path: Folder to add as a column (default: None)
+    :returns: DataFrame
+    """
+
+    # Change specific columns to category type to save memory
+    categories = ['name', 'sample', 'position', 'flat', 'experiment', 'camera', 'replicate']
+
+    # Add folder column and category
+    if path is not None:
+        df['folder'] = path
+        categories += ['folder']
+
+    df[categories] = df[categories].astype("category")
+
+    for col in list(df):
+        if df[col].dropna().size == 0:
+            df.drop(col, axis=1, inplace=True)
+            print('Empty column "{0}" was dropped'.format(col))
+
+    return df
+
+
+def _sort_keys(df):
+    """Sort keys for the sample and time columns
+
+    Samples are numbered in the order used by sort_values, missing
+    samples last.
+
+    :param df: DataFrame
+    :returns: sample codes and times
+    """
+
+    if isinstance(df['sample'].dtype, pd.CategoricalDtype):
+        codes = df['sample'].cat.codes.to_numpy()
+        count = len(df['sample'].cat.categories)
+    else:
+        codes, uniques = pd.factorize(df['sample'], sort=True)
+        count = len(uniques)
+
+    codes = np.where(codes < 0, count, codes)
+
+    return codes, df['time'].to_numpy(dtype=float)
+
+
+def _is_sorted(codes, times, order):
+    """Check if a row order sorts the rows by sample and time
+
+    Rows with the same sample and time need to keep their order, missing
+    times are last for each sample (same as sort_values).
+
+    :param codes: Sample codes (see _sort_keys)
+    :param times: Times
+    :param order: Row positions
+    :returns: True if sorted (bool)
+    """
+
+    codes = codes[order]
+    times = times[order]
+    missing = isnan(times)
+
+    with np.errstate(invalid='ignore'):
+        later = (times[1:] > times[:-1]) | (missing[1:] & ~missing[:-1])
+        same = (times[1:] == times[:-1]) | (missing[1:] & missing[:-1])
+
+    step = np.diff(codes)
+    return bool(np.all((step > 0) | ((step == 0) & (later | (same & (np.diff(order) > 0))))))
+
+
+def _sort_order(df):
+    """Row order of a DataFrame sorted by sample and time
+
+    The order is kept with the DataFrame object (not copied with it, pickled or
+    saved) and only sorted again, if the rows changed (e.g. added, removed or
+    reordered).
+
+    :param df: DataFrame
+    :returns: Row positions
+    """
+
+    codes, times = _sort_keys(df)
+
+    order = getattr(df, SORT_ORDER, None)
+    if order is not None and len(order) == len(df) and _is_sorted(codes, times, order):
+        return order
+
+    order = np.lexsort((times, codes))
+    order.flags.writeable = False
+
+    # Set like the pandas accessors, as it is not a column
+    object.__setattr__(df, SORT_ORDER, order)
+
+    return order
+
+
+def dataframe(path=None, prefix=None, workers=None, cache=False, dtype=None):
     """Build DataFrame from Visual Phenomics output.
 
-    Get a DataFrame for an Experiment from a set of text files with calculated parameters.
+    Get a DataFrame for an Experiment from a set of text files with calculated parameters,
+    or from a bundle exported with to_npz.
+    The parameter files from all folders can be parsed in parallel, using a pool of
+    worker processes.
+
+    With the import cache, parsed parameter files are kept as sidecar files together
+    with a manifest (modification time, size and hash of each file). Unchanged files are
+    not parsed again and for files with new timepoints appended, only the new timepoints
+    are parsed.
+
+    To reduce the memory used, the parameter columns can be stored with single (float32)
+    or half (float16) precision. Time and light intensity are always kept as float64.
 
-    :param path: the path to the directory with calulated parameter text files
+    :param path: the path to the directory with calulated parameter text files or a bundle (.npz)
+    :param prefix: prefix to remove from the file names (default: '^all')
+    :param workers: Number of worker processes to parse files (default: None, no parallel processing)
+    :param cache: True to keep an import cache in each folder (.vppy_cache), or a directory for the import caches (default: False)
+    :param dtype: Float type of the parameter columns, float64, float32 or float16 (default: None, float64)
     :returns: a dataframe containing parameters from all files
     :raises Exception: if the path is invalid or the data is malformed
     """
@@ -22,6 +706,8 @@ def dataframe(path=None, prefix=None):
     if path is None:
         raise Exception('Path not defined.')
 
+    dtype = float if dtype is None else _float_dtype(dtype)
+
     paths = []
     if isinstance(path, str):
         paths.append(path)
@@ -29,174 +715,263 @@ def dataframe(path=None, prefix=None):
     elif isinstance(path, list):
         paths += path
 
-    for idx, p in enumerate(paths):
-        files = os.listdir(p)
+    folders = [_read_tasks(p, prefix, cache) for p in paths]
+
+    if workers is not None and workers > 1:
+        # Parse the files of all folders at once
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [[executor.submit(fn, *args) for file_name, f, fn, args in tasks] for tasks in folders]
+            results = [[future.result() for future in folder] for folder in futures]
+    else:
+        results = [[fn(*args) for file_name, f, fn, args in tasks] for tasks in folders]
+
+    # Merge the files by folder
+    frames = []
+    for p, tasks, parsed in zip(paths, folders, results):
+        if cache and not os.path.isfile(p):
+            parsed = _update_cache(_cache_dir(p, cache), [f for file_name, f, fn, args in tasks], parsed)
+        frames.append(_merge_files([(file_name, f, data) for (file_name, f, fn, args), data in zip(tasks, parsed)], dtype))
+
+    # Add the folder column if multiple folders are imported
+    frames = [_prepare_folder(dfTMP, p if len(paths) > 1 else None) for p, dfTMP in zip(paths, frames)]
+
+    # Concatenate all folders at once
+    if len(frames) == 1:
+        df = frames[0]
+    else:
+        df = pd.concat(frames, sort=False, ignore_index=True)
+
+    # Day of the experiment starting with day 1, times at exactly
+    # 24 hours belong to the beginning of the next day
+    day = np.floor(df['time'].to_numpy(dtype=float) / 24)
+    day[day < 0] = nan
+    df['day'] = day + 1
+
+    # Hours into the day, rounded once for each unique time
+    codes, hours = pd.factorize(df['time'].to_numpy(dtype=float) - day * 24)
+    hours = np.append([round(hour, 4) for hour in hours], nan)
+    df['hours_day'] = hours[codes]
+
+    # Sort by sample and time once, reused by the calculations
+    _sort_order(df)
+
+    return df
+
+
+def _pyarrow(file_format):
+    """Import pyarrow for the Parquet and Feather formats
+
+    :param file_format: Format requiring pyarrow
+    :returns: pyarrow module
+    :raises Exception: if pyarrow is not installed
+    """
+
+    try:
+        import pyarrow
+        import pyarrow.feather
+    except ImportError:
+        raise Exception('The {0} format requires pyarrow, install it with "pip install pyarrow".'.format(file_format))
+
+    return pyarrow
 
-        dfheader = ['sample', 'name', 'time', 'light_intensity']
-        dfbody = []
-        dfdict = {}
-        dflightint = {}
 
-        for f in files:
+def _load_filters(experiment=None, name=None, day=None):
+    """Get the row filters for loading a DataFrame
 
-            if prefix is None:
-                prefix = r'^all'
-            else:
-                prefix = r'{0}'.format(prefix)
+    :param experiment: Experiment or list of experiments
+    :param name: Sample name or list of sample names
+    :param day: Day or list of days
+    :returns: dict with column and list of values
+    """
 
-            file_name = re.sub(prefix, '', os.path.splitext(f)[0], 1)
-            file_ext = os.path.splitext(f)[1]
-            if file_ext == '.txt':
-                # opening the CSV file
-                with open(p+f, mode='r') as file:
+    filters = {}
+    for col, values in [('experiment', experiment), ('name', name), ('day', day)]:
+        if values is None:
+            continue
+        if not isinstance(values, (list, tuple, set, np.ndarray, pd.Index, pd.Series)):
+            values = [values]
+        filters[col] = list(values)
 
-                    # reading the CSV file
-                    csvFile = csv.DictReader(file, delimiter='\t')
+    return filters
 
-                    # define possible sample header column names
-                    sampleNameHeader = 'name[position][flat][experiment][camera][replicate]'
-                    sampleNameHeaderOld = 'name[flat][experiment][camera][replicate]'
 
-                    # Get the header from the first column
-                    sampleNameHeaderUse = str(csvFile.fieldnames[0])
+def _save_npy(df, folder):
+    """Save a DataFrame as a folder with a .npy file per column
 
-                    # New Header format
-                    if (sampleNameHeader in csvFile.fieldnames):
-                        sampleNameHeaderUse = sampleNameHeader
+    Numeric columns are saved as they are, categorical and other columns
+    as codes, with the categories in the metadata file.
 
-                    # Old sample header format
-                    elif (sampleNameHeader not in csvFile.fieldnames) & (sampleNameHeaderOld in csvFile.fieldnames):
-                        sampleNameHeaderUse = sampleNameHeaderOld
+    :param df: DataFrame
+    :param folder: Folder to save the DataFrame in
+    """
 
-                    # Not matching the standard header format
-                    else:
-                        print('File "{0}" does not support the standard annotation format, falling back to simple import.'.format(f))
+    if not os.path.exists(folder):
+        os.makedirs(folder)
 
-                    # add column header
-                    dfheader.append(file_name)
+    metadata = {'version': NPY_VERSION, 'length': len(df), 'columns': [], 'attrs': df.attrs}
 
-                    # looping through the rows in the csv file
-                    for lines in csvFile:
+    for i, col in enumerate(df.columns):
+        column = {'name': col, 'file': '{0}.npy'.format(i)}
 
-                        # get the sample name
-                        sample = lines[sampleNameHeaderUse]
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            values = df[col].cat.codes.to_numpy()
+            column['kind'] = 'category'
+            column['categories'] = df[col].cat.categories.tolist()
+            column['ordered'] = bool(df[col].cat.ordered)
 
-                        # if the sample name is empty or null, skip the row
-                        if (sample[0] == '[') or (re.match(r'^null', sample)):
-                            continue
+        elif df[col].dtype.kind in 'biuf':
+            values = df[col].to_numpy()
+            column['kind'] = 'array'
 
-                        # get all items
-                        for key, value in lines.items():
+        else:
+            codes, categories = pd.factorize(df[col])
+            values = codes
+            column['kind'] = 'object'
+            column['categories'] = categories.tolist()
 
-                            # Skip the first row
-                            if (key == sampleNameHeaderUse):
-                                continue
+        np.save(os.path.join(folder, column['file']), np.ascontiguousarray(values))
+        metadata['columns'].append(column)
 
-                            if (sample == '*light_intensity'):
+    with open(os.path.join(folder, 'metadata.json'), mode='w') as file:
+        json.dump(metadata, file, indent=2)
 
-                                # check if time value is a number or nan
-                                try:
-                                    value = float(value)
-                                except:
-                                    value = nan
+    # Remove columns from a previously saved DataFrame
+    files = [column['file'] for column in metadata['columns']]
+    for f in os.listdir(folder):
+        if f.endswith('.npy') and f not in files:
+            os.remove(os.path.join(folder, f))
 
-                                if str(key) not in dflightint:
-                                    dflightint[str(key)] = value
 
-                                elif isnan(dflightint[str(key)]) & ~isnan(value):
-                                    dflightint[str(key)] = value
+def _npy_metadata(folder):
+    """Load the metadata of a DataFrame saved in the npy format
 
-                                continue
+    :param folder: Folder with the saved DataFrame
+    :returns: metadata (dict)
+    """
 
-                            # Create a dict entry for sample+time if it doesn't exist
-                            if sample+key not in dfdict:
+    try:
+        with open(os.path.join(folder, 'metadata.json'), mode='r') as file:
+            metadata = json.load(file)
+    except (OSError, ValueError):
+        raise Exception('Folder provided does not contain a saved DataFrame.')
 
-                                if (sampleNameHeader in csvFile.fieldnames) | (sampleNameHeaderOld in csvFile.fieldnames):
-                                    meta = re.findall(
-                                        r"\[(.*?)\]", sample)
+    if metadata.get('version') != NPY_VERSION:
+        raise Exception('Saved DataFrame has an unsupported version.')
 
-                                    # Some samples seem to miss the position
-                                    if len(meta) == 4:
-                                        meta.insert(0, "n/a")
-                                    if meta[0] == '':
-                                        meta[0] = "n/a"
+    return metadata
 
-                                    dfdict[sample+key] = {'name': sample.split('[')[0], 'sample': sample, 'light_intensity': nan, 'time': float(
-                                        key), 'position': meta[0], 'flat': meta[1], 'experiment': meta[2], 'camera': meta[3], 'replicate': meta[4]}
 
-                                else:
-                                    dfdict[sample+key] = {'name': sample, 'sample': sample, 'light_intensity': nan, 'time': float(key)}
+def _npy_create(folder, length, dtype=float):
+    """Create a new float column for a DataFrame saved in the npy format
 
-                            # Add nan if float value parsing fails
-                            try:
-                                dfdict[sample +
-                                        key][file_name] = float(value)
-                            except:
-                                dfdict[sample+key][file_name] = nan
+    The column is filled with NaN and only added to the DataFrame with _npy_add.
 
-        dfheader += ['position', 'flat',
-                     'experiment', 'camera', 'replicate']
+    :param folder: Folder with the saved DataFrame
+    :param length: Number of rows
+    :param dtype: Float type (default: float)
+    :returns: file name and writable memory-mapped array
+    """
 
-        for row in dfdict:
-            if 'light_intensity' in dfdict[row]:
-                if str(dfdict[row]['time']) in dflightint:
-                    dfdict[row]['light_intensity'] = dflightint[str(
-                        dfdict[row]['time'])]
-            dfbody.append(dfdict[row])
+    i = len(os.listdir(folder))
+    while os.path.exists(os.path.join(folder, '{0}.npy'.format(i))):
+        i += 1
 
-        dfTMP = pd.DataFrame(dfbody, columns=dfheader)
+    filename = '{0}.npy'.format(i)
+    values = np.lib.format.open_memmap(os.path.join(folder, filename), mode='w+', dtype=dtype, shape=(length,))
+    values[:] = nan
 
-        # Change specific columns to category type to save memory
-        categories = ['name', 'sample', 'position', 'flat', 'experiment', 'camera', 'replicate']
+    return filename, values
 
-        # Add folder column and category
-        if len(paths) > 1:
-            dfTMP['folder'] = p
-            categories += ['folder']
 
-        dfTMP[categories] = dfTMP[categories].astype("category")
+def _npy_add(folder, columns):
+    """Add columns created with _npy_create to a DataFrame saved in the npy format
 
-        for col in list(dfTMP):
-            if dfTMP[col].dropna().size == 0:
-                dfTMP.drop(col, axis=1, inplace=True)
-                print('Empty column "{0}" was dropped'.format(col))
+    Columns with the same name are replaced.
 
-        # Add initial dataframe or append if multiple are present
-        if idx == 0:
-            df = dfTMP
+    :param folder: Folder with the saved DataFrame
+    :param columns: list with column name, file name and record of the calculation (or None)
+    """
+
+    metadata = _npy_metadata(folder)
+    records = dict(metadata['attrs'].get('calculated', {}))
+    replaced = []
+
+    for name, filename, record in columns:
+        column = {'name': name, 'file': filename, 'kind': 'array'}
+        names = [col['name'] for col in metadata['columns']]
+        if name in names:
+            replaced.append(metadata['columns'][names.index(name)]['file'])
+            metadata['columns'][names.index(name)] = column
         else:
-            df = pd.concat([df, dfTMP], sort=False, ignore_index=True)
-
-        # Get the maximum number of days from the experiment time
-        days = int( ceil( df['time'].max() / 24 ) )
-        if df['time'].max() % 24 == 0:
-            days = days + 1
-
-        ## Fill columns with NaN to start with
-        df['day'] = nan
-        df['hours_day'] = nan
-
-        ## Go through data by day
-        for col in range(0, days):
-            ## unique times for the day
-            times = df[(df['time'] >= col * 24) & (df['time'] < col * 24 +24)]['time'].unique()
-            for row in df[(df['time'] >= col * 24) & (df['time'] < col * 24 +24)].itertuples():
-                ## Add day
-                df.at[row.Index, 'day'] = int(col+1)
-                ## Add day_hour
-                df.at[row.Index, 'hours_day'] = round( getattr(row, 'time') - (col * 24), 4 )
+            metadata['columns'].append(column)
+
+        if record is None:
+            records.pop(name, None)
+        else:
+            records[name] = record
+
+    metadata['attrs'] = dict(metadata['attrs'], calculated=records)
+
+    filepath = os.path.join(folder, 'metadata.json')
+    with open(filepath + '.tmp', mode='w') as file:
+        json.dump(metadata, file, indent=2)
+    os.replace(filepath + '.tmp', filepath)
+
+    for filename in replaced:
+        os.remove(os.path.join(folder, filename))
+
+
+def _load_npy(folder, columns=None, mmap=False):
+    """Load a DataFrame saved as a folder with a .npy file per column
+
+    :param folder: Folder with the saved DataFrame
+    :param columns: List of columns to load (default: None, all columns)
+    :param mmap: Memory-map numeric columns instead of reading them (default: False)
+    :returns: DataFrame
+    """
+
+    metadata = _npy_metadata(folder)
+
+    available = [column['name'] for column in metadata['columns']]
+    for col in (columns or []):
+        if col not in available:
+            raise Exception('Column "{0}" not found in saved DataFrame.'.format(col))
+
+    data = {}
+    for column in metadata['columns']:
+        if columns is not None and column['name'] not in columns:
+            continue
+
+        # Copy-on-write, changes are kept in memory and not written to the file
+        values = np.load(os.path.join(folder, column['file']), mmap_mode='c' if mmap else None).view(np.ndarray)
+
+        if column['kind'] == 'category':
+            values = pd.Categorical.from_codes(values, column['categories'], ordered=column['ordered'])
+
+        elif column['kind'] == 'object':
+            values = np.append(np.array(column['categories'], dtype=object), nan)[values]
+
+        data[column['name']] = values
+
+    df = pd.DataFrame(data, columns=[col for col in (columns or available) if col in data], copy=False)
+    df.attrs = metadata['attrs']
 
     return df
 
 
-def save(df=None, path=None, compress='zip'):
+def save(df=None, path=None, compress='zip', format='pickle'):
     """Save current DataFrame
 
-    Save the current DataFrame in the pickle format to avoid re-import and re-calculations.
+    Save the current DataFrame to avoid re-import and re-calculations. Besides the pickle
+    format, the columnar Parquet and Feather formats are available (requires pyarrow),
+    which allow to load selected columns and rows only. The npy format saves a folder
+    with a file per column, that can be memory-mapped when loaded.
 
     :param df: DataFrame
-    :param path: the path to the directory where the DataFrame is saved (as dataframe.pkl).
-    :param compression: Compression algorithm (default: zip)
+    :param path: the path to the directory where the DataFrame is saved (as dataframe.pkl, dataframe.parquet, dataframe.feather or folder dataframe).
+    :param compression: Compression algorithm (default: zip for pickle, snappy for parquet and lz4 for feather)
+    :param format: File format pickle, parquet, feather or npy (default: pickle)
+    :returns: path to the saved file
     """
 
     if df is None:
@@ -205,22 +980,53 @@ def save(df=None, path=None, compress='zip'):
     if path is None or path == '':
         raise Exception('Path not defined.')
 
+    if format not in SAVE_FORMATS:
+        raise Exception('Format "{0}" not available, use {1}.'.format(format, ', '.join(SAVE_FORMATS)))
+
     if not os.path.exists(path):
         os.makedirs(path)
 
-    filepath = os.path.join(path, 'dataframe.pkl')
+    filepath = os.path.join(path, SAVE_FORMATS[format])
 
-    df.to_pickle(filepath, compression=compress)
+    if format == 'pickle':
+        df.to_pickle(filepath, compression=compress)
 
+    elif format == 'parquet':
+        _pyarrow(format)
+        df.to_parquet(filepath, engine='pyarrow', compression='snappy' if compress == 'zip' else compress)
 
-def load(filepath=None, compress='zip'):
+    elif format == 'feather':
+        pyarrow = _pyarrow(format)
+        table = pyarrow.Table.from_pandas(df, preserve_index=False)
+        if df.attrs:
+            metadata = dict(table.schema.metadata or {})
+            metadata[b'vppy_attrs'] = json.dumps(df.attrs).encode('utf-8')
+            table = table.replace_schema_metadata(metadata)
+        pyarrow.feather.write_feather(table, filepath, compression=None if compress == 'zip' else compress)
+
+    elif format == 'npy':
+        _save_npy(df, filepath)
+
+    return filepath
+
+
+def load(filepath=None, compress='zip', columns=None, experiment=None, name=None, day=None, mmap=False):
     """Read saved DataFrame
 
-    Read a saved DataFrame from file. If you have selected a specific compression to save the DataFrame, make sure to provide the same when loading the DataFrame
+    Read a saved DataFrame from file. If you have selected a specific compression to save the DataFrame, make sure to provide the same when loading the DataFrame.
+    The format is determined by the file extension (.parquet, .feather, otherwise pickle). For Parquet and Feather
+    files only the selected columns are read and for Parquet files only the rows matching the filters.
+    DataFrames saved in the npy format (folder) can be memory-mapped, so numeric columns are only read
+    from the file when they are used.
 
     :param df: DataFrame
     :param path: the path to the file with the saved DataFrame.
     :param compression: Compression algorithm (default: zip)
+    :param columns: List of columns to load (default: None, all columns)
+    :param experiment: Only load rows for an experiment or list of experiments (default: None)
+    :param name: Only load rows for a sample name or list of sample names (default: None)
+    :param day: Only load rows for a day or list of days (default: None)
+    :param mmap: Memory-map numeric columns, npy format only (default: False)
     :returns: Dataframe
     """
 
@@ -230,4 +1036,46 @@ def load(filepath=None, compress='zip'):
     if not os.path.exists(filepath):
         raise Exception('Filepath provided does not exist.')
 
-    return pd.read_pickle(filepath, compression=compress)
+    filters = _load_filters(experiment, name, day)
+    file_ext = os.path.splitext(filepath)[1].lower()
+
+    if mmap and not os.path.isdir(filepath):
+        raise Exception('Memory-mapping is only available for DataFrames saved in the npy format.')
+
+    if file_ext == '.parquet':
+        _pyarrow('parquet')
+        df = pd.read_parquet(filepath, engine='pyarrow', columns=columns,
+                             filters=[(col, 'in', values) for col, values in filters.items()] or None)
+        return df.reset_index(drop=True) if filters else df
+
+    # Columns needed to filter the rows
+    read_columns = columns
+    if columns is not None:
+        read_columns = list(dict.fromkeys(list(columns) + list(filters)))
+
+    if os.path.isdir(filepath):
+        df = _load_npy(filepath, read_columns, mmap)
+
+    elif file_ext in ['.feather', '.arrow']:
+        pyarrow = _pyarrow('feather')
+        table = pyarrow.feather.read_table(filepath, columns=read_columns)
+        df = table.to_pandas()
+        metadata = table.schema.metadata or {}
+        if b'vppy_attrs' in metadata:
+            df.attrs = json.loads(metadata[b'vppy_attrs'].decode('utf-8'))
+
+    else:
+        df = pd.read_pickle(filepath, compression=compress)
+        if read_columns is not None:
+            df = df[read_columns]
+
+    if filters:
+        rows = np.ones(len(df), dtype=bool)
+        for col, values in filters.items():
+            rows &= df[col].isin(values).to_numpy()
+        df = df[rows].reset_index(drop=True)
+
+    if columns is not None and list(df.columns) != list(columns):
+        df = df[list(columns)]
+
+    return df
@@ -3,42 +3,187 @@ Export data from the DataFrame into the Visual Phenomics
 text file format
 """
 
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 import os
 import csv
 import numpy as np
+from numpy import nan
+import pandas as pd
 
+from visual_phenomics_py.dataframe import SAMPLE_HEADER, BUNDLE_VERSION
 
-def to_txt(df=None, folder=None, cols=[]):
-    """Export DataFrame as text files.
+# Columns that are not exported
+TO_IGNORE = ['sample', 'name', 'position', 'flat', 'experiment',
+             'camera', 'replicate', 'time', 'light_intensity']
 
-    Each column of the DataFrame gets exported as a tab separated file.
-    The first column in each file contains the sample information.
-    The first row in each file contains the column headers. The column 
-    headers are the timeing information as well.
-    The last row contains the light intensity if available.
+
+def _light_intensities(df):
+    """Light intensities by time
 
     :param df: DataFrame
+    :returns: dict with the light intensity for each time (as string)
     """
 
-    if df is None:
-        raise Exception('No DataFrame selected.')
+    times = df[['time', 'light_intensity']].drop_duplicates()
+
+    return dict(zip([str(time) for time in times['time'].tolist()], times['light_intensity'].tolist()))
+
+
+def _pivot(df, column):
+    """Sample by time table for a column
+
+    Samples without any values are skipped and missing values are NaN.
+    If a sample has multiple values for the same time, the last one is used.
+
+    :param df: DataFrame
+    :param column: Column to export
+    :returns: Times, labels of the samples and table with a row for each sample
+    """
+
+    # Samples numbered in order of appearance
+    sample_codes = pd.factorize(df['sample'])[0]
+
+    rows = np.flatnonzero(df[column].notna().to_numpy())
+
+    # Get the correct number of timepoints for each parameter
+    csv_times = df['time'].iloc[rows].sort_values().unique()
+
+    # Rows without sample are not exported
+    rows = rows[sample_codes[rows] >= 0]
+
+    # Last value for each sample and time
+    time_codes = pd.Index(csv_times).get_indexer(df['time'].iloc[rows])
+    codes = sample_codes[rows]
+    last = ~pd.Series(codes * len(csv_times) + time_codes).duplicated(keep='last').to_numpy()
+
+    # Samples with values, ordered by appearance in the DataFrame
+    samples, sample_idx = np.unique(codes, return_inverse=True)
+
+    # Float columns stay numeric, everything else is written as is
+    if df[column].dtype.kind == 'f':
+        values = df[column].to_numpy()[rows]
+        table = np.full((len(samples), len(csv_times)), nan, dtype=values.dtype)
+    else:
+        values = np.array(df[column].iloc[rows].tolist() + [None], dtype=object)[:-1]
+        values[(values == 'nan') | (values == '')] = 'NaN'
+        table = np.full((len(samples), len(csv_times)), 'NaN', dtype=object)
+
+    table[sample_idx[last], time_codes[last]] = values[last]
+
+    # Sample information from the first row of each sample with a value
+    first = rows[np.unique(sample_idx, return_index=True)[1]]
+    meta = zip(*[df[col].iloc[first].tolist() for col in ['name', 'position', 'flat', 'experiment', 'camera', 'replicate']])
+    labels = ["{0}[{1}][{2}][{3}][{4}][{5}]".format(*info) for info in meta]
+
+    return csv_times, labels, table
+
+
+def _rows(labels, table, chunksize=256):
+    """Rows for the text file, generated for a few samples at a time
+
+    :param labels: Labels of the samples
+    :param table: Table with a row for each sample
+    :param chunksize: Number of samples at a time (default: 256)
+    :returns: Generator with a list for each row
+    """
+
+    for start in range(0, len(labels), chunksize):
+        chunk = table[start:start+chunksize]
+
+        # Missing values in numeric tables
+        if chunk.dtype != object:
+            missing = np.isnan(chunk)
+            # Values stored with single or half precision are written
+            # with the shortest representation of that precision
+            if chunk.dtype.itemsize < 8:
+                chunk = chunk.astype(str)
+            chunk = chunk.astype(object)
+            chunk[missing] = 'NaN'
+
+        for label, row in zip(labels[start:start+chunksize], chunk.tolist()):
+            yield [label] + row
+
+
+def _write_table(filename, times, labels, table, light):
+    """Write a sample by time table as text file
+
+    The rows are written while they are generated, so only a few
+    rows are kept in memory.
+
+    :param filename: Output file
+    :param times: Times for the header (strings)
+    :param labels: Labels of the samples
+    :param table: Table with a row for each sample
+    :param light: Light intensities for the times
+    """
+
+    # Open file and start writing
+    with open(filename, 'w') as f:
+
+        # Setup CSV writer
+        writer = csv.writer(f, quoting=csv.QUOTE_NONE, delimiter='\t')
+
+        # Write header column
+        writer.writerow([SAMPLE_HEADER] + list(times))
+
+        # Write Data rows
+        writer.writerows(_rows(labels, table))
+
+        # Add row with light intensities
+        writer.writerow(['*light_intensity'] + list(light))
+
+
+def _export_table(df, column, light_and_times):
+    """Table for a column as it is exported
+
+    :param df: DataFrame
+    :param column: Column to export
+    :param light_and_times: dict with the light intensity for each time (as string)
+    :returns: Times (strings), labels of the samples, table and light intensities
+    """
+
+    csv_times, labels, table = _pivot(df, column)
+
+    # Build header with the correct number of timepoints
+    times = np.append([SAMPLE_HEADER], csv_times)[1:]
+
+    # Build the light intensity row based on the timepoints
+    light = [light_and_times[str(name)] for name in times]
+
+    return times, labels, table, light
+
+
+def _write_txt(df, column, filename, light_and_times):
+    """Write a column to a text file
+
+    :param df: DataFrame
+    :param column: Column to export
+    :param filename: Output file
+    :param light_and_times: dict with the light intensity for each time (as string)
+    """
+
+    _write_table(filename, *_export_table(df, column, light_and_times))
 
-    if folder is None:
-        raise Exception('No output folder selected.')
+
+def _export_columns(df, cols=[]):
+    """Columns to export
+
+    :param df: DataFrame
+    :param cols: List of columns to export (default: all columns)
+    :returns: list with columns
+    """
 
     # Get parameters for files
     df_columns = df.columns.values.tolist()
-    to_ignore = ['sample', 'name', 'position', 'flat', 'experiment',
-                 'camera', 'replicate', 'time', 'light_intensity']
 
     # Test if all the custom columns exist
     if len(cols) > 0:
 
         # Test if any of the ignored columns are selected
-        if not set(cols).isdisjoint(to_ignore):
+        if not set(cols).isdisjoint(TO_IGNORE):
             not_ignored = []
             for i in cols:
-                if i in to_ignore:
+                if i in TO_IGNORE:
                     not_ignored.append(i)
             raise Exception("The following column(s) cannot be exported: {0}.".format(
                 ", ".join(not_ignored)))
@@ -55,98 +200,200 @@ def to_txt(df=None, folder=None, cols=[]):
         # Overwrite all columns with selected ones
         df_columns = cols
 
-    # first column header
-    csv_first_column = 'name[position][flat][experiment][camera][replicate]'
+    # Skip columns that need to be excluded
+    return [column for column in df_columns if column not in TO_IGNORE]
+
+
+def to_txt(df=None, folder=None, cols=[], workers=None):
+    """Export DataFrame as text files.
+
+    Each column of the DataFrame gets exported as a tab separated file.
+    The first column in each file contains the sample information.
+    The first row in each file contains the column headers. The column 
+    headers are the timeing information as well.
+    The last row contains the light intensity if available.
+    Each column is turned into a sample by time table at once and
+    written while the rows are generated. Columns can be exported in
+    parallel, using a pool of worker processes.
+
+    :param df: DataFrame
+    :param folder: Output folder
+    :param cols: List of columns to export (default: all columns)
+    :param workers: Number of worker processes (default: None, no parallel processing)
+    """
+
+    _to_txt(df, folder, cols, workers)
+
+
+def _to_txt(df=None, folder=None, cols=[], workers=None, light_and_times=None):
+    """Export DataFrame as text files, see :func:`to_txt`
+
+    :param light_and_times: dict with the light intensity for each time (default: None, from the DataFrame)
+    """
+
+    if df is None:
+        raise Exception('No DataFrame selected.')
+
+    if folder is None:
+        raise Exception('No output folder selected.')
+
+    columns = _export_columns(df, cols)
 
     # Make sure folder exists, otherwise create it
     if not os.path.exists(folder):
         os.makedirs(folder)
 
     # Lookup Table for light intensities by time
-    light_and_times = {}
+    if light_and_times is None:
+        light_and_times = _light_intensities(df)
+
+    if workers is not None and workers > 1:
+
+        # Columns required to export a column
+        cols_df = ['sample', 'time', 'name', 'position', 'flat', 'experiment', 'camera', 'replicate']
 
-    for idx, row in df[['time', 'light_intensity']].drop_duplicates().iterrows():
-        light_and_times[str(row['time'])] = row['light_intensity']
+        # Export columns in parallel, with a limited number of columns
+        # waiting to be exported, to keep the memory use low
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            for column in columns:
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
 
-    # Loop through column names
-    for column in df_columns:
+                pending.add(executor.submit(_write_txt, df[cols_df + [column]], column,
+                                            os.path.join(folder, 'all{0}.txt'.format(column)), light_and_times))
 
-        # Skip columns that need to be excluded
-        if column in to_ignore:
-            continue
+            for future in pending:
+                future.result()
 
-        # Get the correct number of timepoints for each parameter
-        csv_times = df.dropna(subset=[column]).sort_values(
-            by='time')['time'].unique()
+    else:
+        for column in columns:
+            _write_txt(df, column, os.path.join(folder, 'all{0}.txt'.format(column)), light_and_times)
 
-        # Build header with the correct number of timepoints
-        csv_column_names = np.append([csv_first_column], csv_times)
 
-        # Build the light intensity row based on the timepoints
-        light_intensity_row = {}
-        for name in csv_column_names:
-            if name == csv_first_column:
-                light_intensity_row[csv_first_column] = '*light_intensity'
-            else:
-                light_intensity_row[str(name)] = light_and_times[str(name)]
+def to_npz(df=None, filepath=None, cols=[], compress=True):
+    """Export DataFrame as a binary bundle.
 
-        # Build filepath and filename
-        output_filename = os.path.join(folder, 'all{0}.txt'.format(column))
+    All columns are saved in a single npz file, with the same content as the
+    text files exported by to_txt, but without converting the values to text.
+    The bundle contains a table with the sample information, the time axis and
+    the light intensities shared by all columns and for each column the values
+    as a sample by time table. The bundle can be imported using dataframe and
+    converted to text files using npz_to_txt.
 
-        # Open file and start writing
-        with open(output_filename, 'w') as f:
+    :param df: DataFrame
+    :param filepath: Output file (.npz)
+    :param cols: List of columns to export (default: all columns)
+    :param compress: Compress the bundle (default: True)
+    :returns: path to the bundle
+    """
+
+    return _to_npz(df, filepath, cols, compress)
+
+
+def _to_npz(df=None, filepath=None, cols=[], compress=True, light_and_times=None):
+    """Export DataFrame as a binary bundle, see :func:`to_npz`
+
+    :param light_and_times: dict with the light intensity for each time (default: None, from the DataFrame)
+    :returns: path to the bundle
+    """
+
+    if df is None:
+        raise Exception('No DataFrame selected.')
+
+    if filepath is None or filepath == '':
+        raise Exception('No output file selected.')
+
+    if not filepath.endswith('.npz'):
+        filepath += '.npz'
+
+    columns = _export_columns(df, cols)
+
+    # Make sure folder exists, otherwise create it
+    folder = os.path.dirname(filepath)
+    if folder != '' and not os.path.exists(folder):
+        os.makedirs(folder)
+
+    # Lookup Table for light intensities by time
+    if light_and_times is None:
+        light_and_times = _light_intensities(df)
+
+    # Sample information and times shared by all columns
+    all_labels = {}
+    all_times = {}
+    all_light = []
 
-            # Setup CSV writer
-            writer = csv.DictWriter(
-                f, fieldnames=csv_column_names, quoting=csv.QUOTE_NONE, delimiter='\t')
+    bundle = {}
+    for i, column in enumerate(columns):
+        times, labels, table, light = _export_table(df, column, light_and_times)
 
-            # Write header column
-            writer.writeheader()
+        for time, intensity in zip(times, light):
+            if time not in all_times:
+                all_times[time] = len(all_times)
+                all_light.append(intensity)
 
-            # Sample row list
-            sample_rows = []
+        for label in labels:
+            if label not in all_labels:
+                all_labels[label] = len(all_labels)
 
-            # Write rows
-            for sample in df['sample'].unique():
+        # Values that are not numeric are saved as they are written to text files
+        if table.dtype == object:
+            table = np.array([[str(value) for value in row] for row in table.tolist()], dtype=str).reshape(table.shape)
 
-                sample_row = {}
+        bundle['samples_{0}'.format(i)] = np.array([all_labels[label] for label in labels], dtype=np.int64)
+        bundle['times_{0}'.format(i)] = np.array([all_times[time] for time in times], dtype=np.int64)
+        bundle['values_{0}'.format(i)] = table
 
-                cols_df = ['sample', 'time', 'name', 'position',
-                           'flat', 'experiment', 'camera', 'replicate', column]
+    bundle['version'] = np.array(BUNDLE_VERSION)
+    bundle['parameters'] = np.array(columns, dtype=str)
+    bundle['labels'] = np.array(list(all_labels), dtype=str)
+    bundle['times'] = np.array(list(all_times), dtype=str)
+    bundle['light'] = np.array(all_light, dtype=float)
 
-                for row in df[df['sample'] == sample].dropna(subset=[column])[cols_df].itertuples():
+    if compress:
+        np.savez_compressed(filepath, **bundle)
+    else:
+        np.savez(filepath, **bundle)
 
-                    # Add first column sample identifier
-                    if csv_first_column not in sample_row:
-                        first_col = "{0}[{1}][{2}][{3}][{4}][{5}]".format(
-                            getattr(row, 'name'),
-                            getattr(row, 'position'),
-                            getattr(row, 'flat'),
-                            getattr(row, 'experiment'),
-                            getattr(row, 'camera'),
-                            getattr(row, 'replicate')
-                        )
+    return filepath
 
-                        sample_row[csv_first_column] = first_col
 
-                    # Add time and datapoint
-                    value = getattr(row, column)
-                    if value == 'nan' or value == '':
-                        value = 'NaN'
-                    sample_row[str(getattr(row, 'time'))] = value
+def npz_to_txt(filepath=None, folder=None):
+    """Convert a binary bundle to text files.
+
+    Each column in the bundle is written as a text file, identical to the
+    files exported by to_txt for the DataFrame the bundle was created from.
+
+    :param filepath: Bundle (.npz) created by to_npz
+    :param folder: Output folder
+    """
+
+    if filepath is None or not os.path.exists(filepath):
+        raise Exception('Bundle not found.')
+
+    if folder is None:
+        raise Exception('No output folder selected.')
+
+    # Make sure folder exists, otherwise create it
+    if not os.path.exists(folder):
+        os.makedirs(folder)
 
-                # Add row to csv
-                if sample_row:
+    with np.load(filepath, allow_pickle=False) as bundle:
 
-                    # Check if all times exist and fill up accordingly
-                    for i in csv_times:
-                        if str(i) not in sample_row:
-                            sample_row[str(i)] = 'NaN'
+        if 'version' not in bundle or int(bundle['version']) != BUNDLE_VERSION:
+            raise Exception('File is not a supported bundle.')
 
-                    sample_rows.append(sample_row)
+        labels = bundle['labels']
+        times = bundle['times']
+        light = bundle['light'].tolist()
 
-            # Write Data rows
-            writer.writerows(sample_rows)
+        for i, column in enumerate(bundle['parameters'].tolist()):
+            time_idx = bundle['times_{0}'.format(i)]
+            table = bundle['values_{0}'.format(i)]
+            if table.dtype.kind != 'f':
+                table = table.astype(object)
 
-            # Add row with light intensities
-            writer.writerow(light_intensity_row)
+            _write_table(os.path.join(folder, 'all{0}.txt'.format(column)), times[time_idx].tolist(),
+                         labels[bundle['samples_{0}'.format(i)]].tolist(), table, [light[idx] for idx in time_idx])
@@ -6,5 +6,6 @@ See the online readme for more information: https://github.com/SeBassTian23/Visu
 """
 
 from visual_phenomics_py.util.parameters import fvfm, npq, npqt, phi2, phino, phinot, phinpq, phinpqt, qe, qesv, qet, qi, qit, ql, qp
+from visual_phenomics_py.util.parameters import phino_from_npq, phinot_from_npqt, phinpq_from_phi2, qet_from_npqt
 from visual_phenomics_py.util.parameters_additional import lef, vx, sphi2, sphinpq
 from visual_phenomics_py.util.timeline import protocol_std_timing
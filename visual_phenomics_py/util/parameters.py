@@ -71,6 +71,21 @@ def phino(fmp, fs, f0p, fm, f0):
 
     ql_val = ql(fmp, fs, f0p)
     npq_val = npq(fm, fmp)
+    return phino_from_npq(npq_val, ql_val, fm, f0)
+
+
+def phino_from_npq(npq_val, ql_val, fm, f0):
+    """Calculate PhiNO from NPQ and qL
+
+    PhiNO = 1 / (npq + (1 + (ql * ((fm/f0)-1)))
+
+    :param npq_val: NPQ
+    :param ql_val: qL
+    :param fm: Fm
+    :param f0: F0
+    :returns: PhiNO (float)
+    """
+
     return 1 / (npq_val + 1 + (ql_val * ((fm/f0)-1)))
 
 
@@ -87,6 +102,20 @@ def phinot(fmp, fs, f0p, fmf0=4.88):
 
     ql_val = ql(fmp, fs, f0p)
     npqt_val = npqt(fmp, f0p, fmf0)
+    return phinot_from_npqt(npqt_val, ql_val, fmf0)
+
+
+def phinot_from_npqt(npqt_val, ql_val, fmf0=4.88):
+    """Calculate PhiNOt from NPQt and qL
+
+    PhiNOt = 1 / (npqt + (1 + (ql * 4.88)))
+
+    :param npqt_val: NPQt
+    :param ql_val: qL
+    :param fmf0: Fv/Fm (default: 4.88)
+    :returns: PhiNOt (float)
+    """
+
     return 1 / (npqt_val + (1 + (ql_val * fmf0)))
 
 
@@ -105,6 +134,19 @@ def phinpq(fmp, fs, f0p, fm, f0):
 
     phi2_val = phi2(fmp, fs)
     phino_val = phino(fmp, fs, f0p, fm, f0)
+    return phinpq_from_phi2(phi2_val, phino_val)
+
+
+def phinpq_from_phi2(phi2_val, phino_val):
+    """Calculate PhiNPQ from Phi2 and PhiNO (or PhiNPQt from Phi2 and PhiNOt)
+
+    PhiNPQ = 1 - (phi2 + phino)
+
+    :param phi2_val: Phi2
+    :param phino_val: PhiNO or PhiNOt
+    :returns: PhiNPQ (float)
+    """
+
     return 1 - (phi2_val + phino_val)
 
 
@@ -122,7 +164,7 @@ def phinpqt(fmp, fs, f0p, fmf0=4.88):
 
     phi2_val = phi2(fmp, fs)
     phinot_val = phinot(fmp, fs, f0p, fmf0)
-    return 1 - (phi2_val + phinot_val)
+    return phinpq_from_phi2(phi2_val, phinot_val)
 
 
 def qe(fmpp, fmp):
@@ -167,6 +209,19 @@ def qet(fmp, f0p, fmpp, f0pp, fmf0=4.88):
 
     npqt_val = npqt(fmp, f0p, fmf0)
     qit_val = qit(fmpp, f0pp, fmf0)
+    return qet_from_npqt(npqt_val, qit_val)
+
+
+def qet_from_npqt(npqt_val, qit_val):
+    """Calculate qEt from NPQt and qIt
+
+    qEt = npqt - qit
+
+    :param npqt_val: NPQt
+    :param qit_val: qIt
+    :returns: qEt (float)
+    """
+
     return npqt_val - qit_val
 
 